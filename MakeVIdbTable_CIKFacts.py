@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+#
+# Create the cik_facts time-series table, the cik_statements view over it and the
+# ticker_cik lookup table for the VI web site.
+#
+# Safe to re-run: everything is created only if missing.
+#
+# Kept for existing jobs; the schema lives in vidb/Schema.py, and
+# python -m vidb schema migrate --table cik_facts does the same.
+#
+import sys
+
+from vidb import LoadVIdbTable_CIKFinancials as loader
+from vidb import Schema
+
+# The connection string may be given as the only argument, otherwise $VIDB_DSN is used
+conn = loader.connect(sys.argv[1] if len(sys.argv) > 1 else None)
+try:
+    Schema.createSchema(conn, ["cik_facts"], migrate=True)
+finally:
+    conn.close()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+#
+# Create the cik_ratios table for the VI web site and fill it from cik_financials.
+#
+# Safe to re-run: the table and its indexes are created only if missing, and the ratios
+# of every company are recomputed.
+#
+# Kept for existing jobs; the schema lives in vidb/Schema.py, and
+# python -m vidb schema migrate --table cik_ratios does the same.
+#
+import sys
+
+from vidb import LoadVIdbTable_CIKFinancials as loader
+from vidb import Schema
+
+# The connection string may be given as the only argument, otherwise $VIDB_DSN is used
+conn = loader.connect(sys.argv[1] if len(sys.argv) > 1 else None)
+try:
+    Schema.createSchema(conn, ["cik_ratios"], migrate=True)
+finally:
+    conn.close()
@@ -0,0 +1,22 @@
+#
+# Shared fixtures for the tests. Filings are made with the benchmarks' synthetic
+# generator, so the tests need no EDGAR data.
+#
+import pytest
+
+from vidb.bench.synthxbrl import writeSyntheticFiling
+
+
+@pytest.fixture
+def syntheticFiling(tmp_path):
+    """Return a function writing a synthetic filing into the test's directory and returning
+    its path. It takes writeSyntheticFiling()'s keyword arguments."""
+    count = [0]
+
+    def write(facts=3000, **kwargs):
+        count[0] += 1
+        path = str(tmp_path / ("synthetic-%d.xml" % count[0]))
+        writeSyntheticFiling(path, facts=facts, **kwargs)
+        return path
+
+    return write
@@ -0,0 +1,93 @@
+#
+# Tests for reading instance documents out of filing archives.
+#
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from vidb.FilingArchives import archiveKind, archivePath, isInstanceDocument, iterArchiveFilings
+
+
+def zipBytes(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zipFile:
+        for name, data in members.items():
+            zipFile.writestr(name, data)
+    return buf.getvalue()
+
+
+def readFilings(path):
+    return [(name, f.read(), size, digest) for name, f, size, digest in iterArchiveFilings(path)]
+
+
+def testIsInstanceDocument():
+    assert isInstanceDocument("edgar/aapl-20150926.xml")
+    assert isInstanceDocument("AAPL-20150926.XML")
+    assert not isInstanceDocument("aapl-20150926_cal.xml")
+    assert not isInstanceDocument("aapl-20150926_pre.xml")
+    assert not isInstanceDocument("FilingSummary.xml")
+    assert not isInstanceDocument("aapl-20150926.xsd")
+
+
+def testArchiveKind():
+    assert archiveKind("filing.ZIP") == "zip"
+    assert archiveKind("2015q3.tar.gz") == "tar"
+    assert archiveKind("2015q3.tbz2") == "tar"
+    assert archiveKind("aapl-20150926.xml") is None
+    assert archivePath("2015q3.tar.gz!a.zip!a.xml") == "2015q3.tar.gz"
+    assert archivePath("a.xml") == "a.xml"
+
+
+def testZipMemberSelection(tmp_path):
+    path = tmp_path / "0001193125-15-356351.zip"
+    path.write_bytes(zipBytes({
+        "aapl-20150926.xml": b"<xbrl>instance</xbrl>",
+        "aapl-20150926_cal.xml": b"<linkbase/>",
+        "aapl-20150926.xsd": b"<schema/>",
+        "FilingSummary.xml": b"<summary/>",
+    }))
+    filings = readFilings(str(path))
+    assert [(name, data, size) for name, data, size, digest in filings] == [
+        (str(path) + "!aapl-20150926.xml", b"<xbrl>instance</xbrl>", 21)]
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz"])
+def testNestedArchives(tmp_path, mode):
+    path = tmp_path / ("2015q3.tar" + (".gz" if mode == "w:gz" else ""))
+    members = {
+        "0000320193-15-000001.zip": zipBytes({"aapl-20150926.xml": b"<xbrl>aapl</xbrl>"}),
+        "0000789019-15-000002.zip": zipBytes({"msft-20150630.xml": b"<xbrl>msft</xbrl>",
+                                              "msft-20150630_lab.xml": b"<linkbase/>"}),
+        "loose-20150930.xml": b"<xbrl>loose</xbrl>",
+    }
+    with tarfile.open(str(path), mode) as tarFile:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tarFile.addfile(info, io.BytesIO(data))
+
+    filings = readFilings(str(path))
+    assert [(name, data) for name, data, size, digest in filings] == [
+        (str(path) + "!0000320193-15-000001.zip!aapl-20150926.xml", b"<xbrl>aapl</xbrl>"),
+        (str(path) + "!0000789019-15-000002.zip!msft-20150630.xml", b"<xbrl>msft</xbrl>"),
+        (str(path) + "!loose-20150930.xml", b"<xbrl>loose</xbrl>"),
+    ]
+    assert len({digest for name, data, size, digest in filings}) == 3
+
+
+def testZipDigestCoversTheMemberName(tmp_path):
+    # Same contents, so same CRC and size, but different filings
+    path = tmp_path / "bulk.zip"
+    path.write_bytes(zipBytes({"a-20150926.xml": b"<xbrl/>", "b-20150926.xml": b"<xbrl/>"}))
+    filings = readFilings(str(path))
+    assert filings[0][3] != filings[1][3]
+
+    again = readFilings(str(path))
+    assert [filing[3] for filing in again] == [filing[3] for filing in filings]
+
+
+def testNotAnArchive(tmp_path):
+    with pytest.raises(ValueError):
+        list(iterArchiveFilings(str(tmp_path / "a.xml")))
@@ -0,0 +1,158 @@
+#
+# Tests for the read-through cik_financials cache, against a fake connection.
+#
+import pytest
+
+from vidb import LoadVIdbTable_CIKFinancials as loader
+from vidb.FinancialsCache import FinancialsCache
+
+
+class Notify:
+
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class FakeCursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        pass
+
+    def execute(self, sql, args=None):
+        self.conn.statements.append(sql)
+        if sql.startswith("SELECT"):
+            self.conn.queries.append(sorted(args[0]))
+            self.result = [self.conn.rows[CIK] for CIK in args[0] if CIK in self.conn.rows]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    """Serves cik_financials rows from a dict, and hands out whatever notifications the
+    test queues."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.autocommit = False
+        self.notifies = []
+        self.statements = []
+        self.queries = []
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def poll(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def financialsRow(CIK, assets):
+    row = [None] * len(loader.CIKFinancialsColumnNames)
+    row[0] = CIK
+    row[loader.CIKFinancialsColumnNames.index("Assets")] = assets
+    return tuple(row)
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection({CIK: financialsRow(CIK, CIK * 1000) for CIK in (320193, 789019, 1018724)})
+    monkeypatch.setattr(loader, "connect", lambda dsn=None: conn)
+    return conn
+
+
+@pytest.fixture
+def makeCache(conn):
+    caches = []
+
+    def make(**kwargs):
+        cache = FinancialsCache(**kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def testReadThrough(conn, makeCache):
+    cache = makeCache()
+    assert conn.autocommit
+    assert conn.statements == ["LISTEN " + loader.INVALIDATION_CHANNEL]
+
+    assert cache.getFinancials(320193)["Assets"] == 320193000
+    assert cache.getFinancials(320193)["Assets"] == 320193000
+    assert conn.queries == [[320193]]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Only the CIKs not cached are fetched, in one query
+    found = cache.getMany([320193, 789019, 1018724])
+    assert sorted(found) == [320193, 789019, 1018724]
+    assert conn.queries == [[320193], [789019, 1018724]]
+
+
+def testCIKsWithoutARowAreCached(conn, makeCache):
+    cache = makeCache()
+    assert cache.getFinancials(1) is None
+    assert cache.getFinancials(1) is None
+    assert conn.queries == [[1]]
+
+
+def testLeastRecentlyUsedEviction(conn, makeCache):
+    cache = makeCache(maxEntries=2)
+    cache.getFinancials(320193)
+    cache.getFinancials(789019)
+    cache.getFinancials(320193)
+    cache.getFinancials(1018724)
+    assert list(cache.entries) == [320193, 1018724]
+
+    cache.getFinancials(789019)
+    assert conn.queries[-1] == [789019]
+
+
+def testExpiredEntriesAreFetchedAgain(conn, makeCache):
+    cache = makeCache(ttlSeconds=0)
+    cache.getFinancials(320193)
+    cache.getFinancials(320193)
+    assert conn.queries == [[320193], [320193]]
+    assert cache.hits == 0
+
+
+def testInvalidate(conn, makeCache):
+    cache = makeCache()
+    cache.getMany([320193, 789019])
+    # The loader tells the caches in its own process about each batch it commits
+    loader.announceUpserted([320193])
+    assert list(cache.entries) == [789019]
+
+    cache.getFinancials(320193)
+    assert conn.queries[-1] == [320193]
+
+
+def testPollInvalidations(conn, makeCache):
+    cache = makeCache()
+    cache.getMany([320193, 789019, 1018724])
+    conn.notifies.append(Notify("320193,1018724"))
+    conn.rows[320193] = financialsRow(320193, 1)
+
+    assert cache.getFinancials(320193)["Assets"] == 1
+    assert conn.notifies == []
+    assert list(cache.entries) == [789019, 320193]
+
+
+def testCloseStopsListening(conn, makeCache):
+    cache = makeCache()
+    assert cache.invalidate in loader.upsertListeners
+    cache.close()
+    assert cache.invalidate not in loader.upsertListeners
+    assert conn.closed
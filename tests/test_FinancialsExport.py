@@ -0,0 +1,69 @@
+#
+# Tests for exporting statement periods to columnar files.
+#
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from vidb.FinancialsExport import FinancialsExporter, readExport, statementRecords
+
+fiscal2015 = (datetime(2014, 9, 28), datetime(2015, 9, 26))
+fiscal2014 = (datetime(2013, 9, 29), datetime(2014, 9, 27))
+statements = [
+    ("instant", None, fiscal2015[1], {"Assets": 290479000000, "NetIncomeLoss": 1}),
+    ("annual", fiscal2015[0], fiscal2015[1], {"NetIncomeLoss": 53394000000, "EarningsPerShareDiluted": Decimal("9.22")}),
+    ("instant", None, fiscal2014[1], {"Assets": 231839000000}),
+    ("annual", fiscal2014[0], fiscal2014[1], {"NetIncomeLoss": Decimal("39510000000.5"),
+                                              "EarningsPerShareDiluted": Decimal("6.45123")}),
+]
+
+
+def testStatementRecordsMergeInstantsIntoPeriods():
+    records = list(statementRecords(320193, statements))
+    assert [(record["period_type"], record["period_end"]) for record in records] == [
+        ("annual", date(2015, 9, 26)), ("annual", date(2014, 9, 27))]
+
+    current = records[0]
+    assert current["cik"] == 320193
+    assert current["year"] == 2015
+    assert current["period_start"] == date(2014, 9, 28)
+    assert current["Assets"] == 290479000000
+    # The date range facts win over instant facts of the same name
+    assert current["NetIncomeLoss"] == 53394000000
+    assert current["Goodwill"] is None
+    assert records[1]["Assets"] == 231839000000
+
+
+def testStatementRecordsConvertValues():
+    records = list(statementRecords(320193, statements))
+    assert records[0]["EarningsPerShareDiluted"] == Decimal("9.2200")
+    assert str(records[0]["EarningsPerShareDiluted"]) == "9.2200"
+    assert records[1]["EarningsPerShareDiluted"] == Decimal("6.4512")
+    # Amounts that are not integers are left out, as they are from cik_financials
+    assert records[1]["NetIncomeLoss"] is None
+
+
+def testStatementRecordsSkipInstantOnlyFilings():
+    assert list(statementRecords(320193, statements[0::2])) == []
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def testExportRoundTrip(tmp_path, format):
+    pa = pytest.importorskip("pyarrow")
+    pytest.importorskip("pyarrow.dataset")
+    directory = str(tmp_path / "export")
+    exporter = FinancialsExporter(directory, format, rowsPerFile=1)
+    exporter.add((320193, None, None, statements))
+    exporter.add((0, None, None, statements))
+    assert exporter.close() == 2
+
+    table = readExport(directory, format, columns=["cik", "period_end", "Assets", "EarningsPerShareDiluted"],
+                       filter=pa.dataset.field("year") >= 2015)
+    assert table.to_pylist() == [{
+        "cik": 320193,
+        "period_end": date(2015, 9, 26),
+        "Assets": 290479000000,
+        "EarningsPerShareDiluted": Decimal("9.2200"),
+    }]
+    assert len(readExport(directory, format)) == 2
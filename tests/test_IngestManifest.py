@@ -0,0 +1,42 @@
+#
+# Tests for the record of ingested filings.
+#
+import os
+
+from vidb.IngestManifest import IngestManifest, accessionNumber
+
+
+def testAccessionNumber():
+    assert accessionNumber("edgar/data/320193/000119312515356351/aapl-20150926.xml") == "0001193125-15-356351"
+    assert accessionNumber("filings/0001193125-15-356351.zip!aapl-20150926.xml") == "0001193125-15-356351"
+    # The last one wins: the CIK directory is not an accession number, the filing's is
+    assert accessionNumber("0000320193-14-000001/0001193125-15-356351/a.xml") == "0001193125-15-356351"
+
+
+def testAccessionNumberFallsBackToThePath(tmp_path):
+    path = str(tmp_path / "aapl-20150926.xml")
+    assert accessionNumber(path) == os.path.abspath(path)
+
+
+def testCheckFiling(tmp_path):
+    path = tmp_path / "0001193125-15-356351.xml"
+    path.write_text("<xbrl/>")
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite3"))
+    try:
+        state = manifest.checkFiling(str(path))
+        assert state is not None
+        assert state[0] == "0001193125-15-356351"
+        manifest.recordFilings([(str(path), state, 320193)])
+        assert manifest.checkFiling(str(path)) is None
+
+        # Touched but not changed: still up to date
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        assert manifest.checkFiling(str(path)) is None
+
+        path.write_text("<xbrl>changed</xbrl>")
+        changed = manifest.checkFiling(str(path))
+        assert changed is not None
+        assert changed[3] != state[3]
+    finally:
+        manifest.close()
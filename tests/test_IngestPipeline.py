@@ -0,0 +1,44 @@
+#
+# Tests for the ingest pipeline's writer threads, with a fake connection pool.
+#
+import queue
+import threading
+
+from vidb.IngestPipeline import STOP, IngestPipeline
+
+
+class FailingPool:
+
+    def __init__(self):
+        self.returned = []
+
+    def getconn(self):
+        raise OSError("could not connect to server")
+
+    def putconn(self, conn):
+        self.returned.append(conn)
+
+
+def testWriterThatCannotConnectReportsTheError():
+    # The pipeline is put together by hand, so no database driver is needed
+    pipeline = IngestPipeline.__new__(IngestPipeline)
+    pipeline.pool = FailingPool()
+    pipeline.queue = queue.Queue()
+    pipeline.flushSeconds = 5.0
+    pipeline.batchSize = 10
+    pipeline.lock = threading.Lock()
+    pipeline.loaded = 0
+    pipeline.error = None
+
+    for filing in [(320193, {}, {}, []), (789019, {}, {}, []), STOP]:
+        pipeline.queue.put(filing)
+    thread = threading.Thread(target=pipeline.writeLoop)
+    thread.start()
+    thread.join(10)
+
+    assert not thread.is_alive()
+    assert isinstance(pipeline.error, OSError)
+    # The queue is drained so the producer is not left blocked, and no connection that
+    # was never obtained is handed back
+    assert pipeline.queue.empty()
+    assert pipeline.pool.returned == []
@@ -0,0 +1,54 @@
+#
+# Tests for turning parsed statement periods into cik_facts rows.
+#
+from datetime import datetime
+from decimal import Decimal
+
+from vidb import LoadVIdbTable_CIKFacts as factLoader
+from vidb.LoadVIdbTable_CIKFinancials import convertValue
+
+
+def testConvertValue():
+    assert convertValue(320193, "Assets", "bigint", 290479000000) == "290479000000"
+    assert convertValue(320193, "Assets", "bigint", Decimal(2**63 - 1)) == str(2**63 - 1)
+    assert convertValue(320193, "Assets", "bigint", Decimal(2**63)) is None
+    assert convertValue(320193, "Assets", "bigint", Decimal("1.5")) is None
+    assert convertValue(320193, "Assets", "bigint", Decimal("1500.000")) == "1500"
+    assert convertValue(320193, "EarningsPerShareDiluted", "money", Decimal("9.22")) == "9.22"
+    assert convertValue(320193, "Assets", "bigint", "n/a") is None
+
+
+def testFactRowsFiltersStatementConcepts():
+    periodEnd = datetime(2015, 9, 26)
+    facts = {
+        "Assets": Decimal(2**63),
+        "NetIncomeLoss": Decimal("1.5"),
+        "Liabilities": 171124000000,
+        "EarningsPerShareDiluted": Decimal("9.22"),
+        "SyntheticConcept": Decimal(2**70),
+        "SyntheticRatio": Decimal("0.25"),
+    }
+    rows = factLoader.factRows([(320193, None, None, [("instant", None, periodEnd, facts)])])
+
+    values = {concept: row[5] for (CIK, end, periodType, concept), row in rows.items()}
+    # Statement values that would not fit their cik_statements column are dropped, the
+    # rest kept as numbers
+    assert values == {
+        "Liabilities": "171124000000",
+        "EarningsPerShareDiluted": "9.22",
+        "SyntheticConcept": str(2**70),
+        "SyntheticRatio": "0.25",
+    }
+    assert rows[(320193, periodEnd, "instant", "Liabilities")] == [
+        "320193", "2015-09-26", "instant", "Liabilities", None, "171124000000"]
+
+
+def testFactRowsLaterFilingWins():
+    periodStart, periodEnd = datetime(2013, 9, 29), datetime(2014, 9, 27)
+    original = (320193, None, None, [("annual", periodStart, periodEnd, {"NetIncomeLoss": 39510000000})])
+    restated = (320193, None, None, [("annual", periodStart, periodEnd, {"NetIncomeLoss": 39500000000})])
+    rows = factLoader.factRows([original, restated, (0, None, None, original[3])])
+    assert list(rows) == [(320193, periodEnd, "annual", "NetIncomeLoss")]
+    assert rows[(320193, periodEnd, "annual", "NetIncomeLoss")] == [
+        "320193", "2014-09-27", "annual", "NetIncomeLoss", "2013-09-29", "39500000000"]
+    assert factLoader.rowYears(rows) == {2014}
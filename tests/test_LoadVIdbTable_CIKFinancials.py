@@ -0,0 +1,72 @@
+#
+# Tests for turning parsed filings into cik_financials rows and merging them.
+#
+from datetime import datetime
+
+from vidb import LoadVIdbTable_CIKFinancials as loader
+from vidb import Schema
+
+
+class RecordingCursor:
+    """Keeps the SQL it is given and the CSV text of each COPY."""
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+
+    def execute(self, sql, args=None):
+        self.statements.append(sql)
+
+    def copy_expert(self, sql, f):
+        self.statements.append(sql)
+        self.copied.append(f.read())
+
+
+balanceDict = {"Assets": 290479000000, "CashAndCashEquivalentsAtCarryingValue": 21120000000}
+incomeDict = {"NetIncomeLoss": 53394000000, "EarningsPerShareDiluted": "9.22"}
+statements = [
+    ("instant", None, datetime(2015, 9, 26), balanceDict),
+    ("annual", datetime(2014, 9, 28), datetime(2015, 9, 26), incomeDict),
+    ("instant", None, datetime(2014, 9, 27), {"Assets": 231839000000}),
+]
+
+
+def testCurrentPeriodEnd():
+    assert loader.currentPeriodEnd(balanceDict, incomeDict, statements) == datetime(2015, 9, 26)
+    assert loader.currentPeriodEnd(None, {"Assets": 231839000000}, statements) == datetime(2014, 9, 27)
+    assert loader.currentPeriodEnd(None, None, statements) is None
+
+
+def testFilingToRow():
+    row = loader.filingToRow(320193, balanceDict, incomeDict, datetime(2015, 9, 26))
+    assert len(row) == len(loader.CIKFinancialsRowColumnNames)
+    values = dict(zip(loader.CIKFinancialsRowColumnNames, row))
+    assert values["cik"] == "320193"
+    assert values["Assets"] == "290479000000"
+    assert values["EarningsPerShareDiluted"] == "9.22"
+    assert values["Goodwill"] is None
+    assert values["period_end"] == "2015-09-26"
+    assert loader.hasStatementData(row)
+
+
+def testRowWithOnlyAPeriodEndHasNoStatementData():
+    assert not loader.hasStatementData(loader.filingToRow(320193, None, None, datetime(2015, 9, 26)))
+
+
+def testMergeRowsReplacesWholeRowsOfLaterPeriods():
+    cur = RecordingCursor()
+    loader.mergeRows(cur, [loader.filingToRow(320193, balanceDict, incomeDict, datetime(2015, 9, 26))])
+    insert = [sql for sql in cur.statements if sql.startswith("INSERT")][0]
+    assert "COALESCE" not in insert
+    assert '"Goodwill" = EXCLUDED."Goodwill"' in insert
+    assert '"period_end" = EXCLUDED."period_end"' in insert
+    assert insert.endswith("WHERE cik_financials.period_end IS NULL OR " +
+                           "EXCLUDED.period_end >= cik_financials.period_end")
+    assert cur.copied[0].rstrip("\n").endswith(",2015-09-26")
+
+
+def testMigrationAddsPeriodEnd():
+    existingColumns = dict(loader.CIKFinancialsColumns)
+    statements = Schema.financialsStatements(existingColumns)
+    assert 'ALTER TABLE cik_financials ADD COLUMN "period_end" date' in statements
+    assert '"period_end" date' in statements[0]
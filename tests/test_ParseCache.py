@@ -0,0 +1,43 @@
+#
+# Tests for the on-disk cache of extracted filings.
+#
+import os
+
+from vidb.ParseCache import ParseCache
+
+
+def testGetAndPut(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    assert cache.get("ab" * 32, 1) is None
+    cache.put("ab" * 32, 1, {"facts": [1, 2, 3]})
+    assert cache.get("ab" * 32, 1) == {"facts": [1, 2, 3]}
+    # Another parser version is another entry
+    assert cache.get("ab" * 32, 2) is None
+
+
+def testUnreadableEntryIsDiscarded(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    cache.put("cd" * 32, 1, "value")
+    path = cache.entryPath("cd" * 32, 1)
+    with open(path, "wb") as f:
+        f.write(b"\x80\x05not a pickle")
+    assert cache.get("cd" * 32, 1) is None
+    assert not os.path.exists(path)
+
+
+def testLeastRecentlyUsedEntriesAreEvicted(tmp_path):
+    cache = ParseCache(str(tmp_path), maxBytes=3000)
+    digests = [str(i) * 64 for i in range(3)]
+    value = b"x" * 1200
+
+    cache.put(digests[0], 1, value)
+    os.utime(cache.entryPath(digests[0], 1), (1000, 1000))
+    cache.put(digests[1], 1, value)
+    os.utime(cache.entryPath(digests[1], 1), (2000, 2000))
+    # Reading the first entry makes it the most recently used
+    assert cache.get(digests[0], 1) == value
+
+    cache.put(digests[2], 1, value)
+    assert cache.get(digests[1], 1) is None
+    assert cache.get(digests[0], 1) == value
+    assert cache.get(digests[2], 1) == value
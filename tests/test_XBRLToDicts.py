@@ -0,0 +1,238 @@
+#
+# Tests for the parser: the fact store, period selection and finding filings.
+#
+import os
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from vidb import XBRLToDicts
+from vidb.XBRLToDicts import DECIMALS_INF, DECIMALS_NONE, FactStore, XBRLParser, selectPeriods
+
+
+def parse(path, **kwargs):
+    xbrlParser = XBRLParser(path, "etree", **kwargs)
+    balanceDict, incomeDict = xbrlParser.parseFiling()
+    return xbrlParser, balanceDict, incomeDict
+
+
+def testAddFactKeepsIntegers():
+    facts = FactStore()
+    assert facts.addFact("Assets", "I0", "usd", "-6", " 1000000\n")
+    assert facts.valueAt(0) == 1000000
+    assert facts.decimalValues == {}
+    assert facts.factDecimals[0] == -6
+
+
+def testAddFactKeepsInt64OverflowAsDecimal():
+    facts = FactStore()
+    assert facts.addFact("Assets", "I0", "usd", "0", str(2**63))
+    assert facts.addFact("Liabilities", "I0", "usd", "0", str(-2**63 - 1))
+    assert facts.factValue[0] == 0
+    assert facts.valueAt(0) == Decimal(2**63)
+    assert facts.valueAt(1) == Decimal(-2**63 - 1)
+
+
+def testAddFactKeepsFractionsAsDecimal():
+    facts = FactStore()
+    assert facts.addFact("EarningsPerShareBasic", "D0", "usdPerShare", "2", "9.22")
+    assert facts.valueAt(0) == Decimal("9.22")
+
+
+def testAddFactDecimalsAttribute():
+    facts = FactStore()
+    facts.addFact("Assets", "I0", "usd", "INF", "5")
+    facts.addFact("Assets", "I1", "usd", None, "6")
+    assert list(facts.factDecimals) == [DECIMALS_INF, DECIMALS_NONE]
+
+
+@pytest.mark.parametrize("text", ["", "n/a", "1,000", "NaN", "Infinity"])
+def testAddFactRejectsNonNumbers(text):
+    facts = FactStore()
+    assert not facts.addFact("Assets", "I0", "usd", "-6", text)
+    assert len(facts) == 0
+
+
+def testFactStoreInternsNames():
+    facts = FactStore()
+    facts.addFact("Assets", "I0", "usd", "-6", "1")
+    facts.addFact("Assets", "I1", "usd", "-6", "2")
+    facts.addFact("Liabilities", "I0", "usd", "-6", "3")
+    assert facts.concepts == ["Assets", "Liabilities"]
+    assert facts.contexts == ["I0", "I1"]
+    assert facts.factsForContext(0) == {"Assets": 1, "Liabilities": 3}
+    assert facts.contextsWithConcept("Liabilities") == {0}
+    assert list(facts.contextFactCounts()) == [2, 1]
+
+
+def testCurrentPeriodComesFromConsolidatedContexts(syntheticFiling):
+    path = syntheticFiling(facts=5000, dimensionalContexts=40)
+    xbrlParser, balanceDict, incomeDict = parse(path)
+    extracted = xbrlParser.extractFiling()
+    facts = extracted.facts
+
+    # The segment contexts cover the same period as D0 and have as many facts, but the
+    # statements come from the consolidated contexts
+    assert len(extracted.DimensionalContextDict) == 40
+    assert incomeDict == facts.factsForContext(facts.contextIDs["D0"])
+    assert balanceDict == facts.factsForContext(facts.contextIDs["I0"])
+
+
+def testSelectPeriodsReturnsComparativePeriodsLatestFirst(syntheticFiling):
+    path = syntheticFiling(facts=1600, contexts=6)
+    xbrlParser, balanceDict, incomeDict = parse(path)
+    periods = xbrlParser.periods
+
+    assert [period.periodEnd for period in periods] == sorted((period.periodEnd for period in periods), reverse=True)
+    assert len(periods) == 3
+    assert [period.isCurrent for period in periods] == [True, False, False]
+    assert periods[0].periodEnd == datetime(2015, 9, 26)
+    assert (periods[0].periodEnd - periods[0].periodStart).days == 364
+
+
+def testSelectPeriodsSkipsSparseContexts(syntheticFiling):
+    path = syntheticFiling()
+    xbrlParser = XBRLParser(path, "etree")
+    extracted = xbrlParser.extractFiling()
+    assert selectPeriods(extracted, minFacts=5)
+    assert selectPeriods(extracted, minFacts=10**6) == []
+
+
+@pytest.mark.parametrize("docType, rangeType", [("10-K", "annual"), ("10-Q", "quarter")])
+def testStatementPeriods(syntheticFiling, docType, rangeType):
+    path = syntheticFiling(contexts=6, docType=docType)
+    xbrlParser = parse(path)[0]
+    statements = XBRLToDicts.statementPeriods(xbrlParser.periods, docType)
+    assert [statement[0] for statement in statements] == ["instant", rangeType] * 3
+    periodType, periodStart, periodEnd, facts = statements[1]
+    assert periodEnd == datetime(2015, 9, 26)
+    assert facts is xbrlParser.periods[0].DateRangeContextData
+    assert XBRLToDicts.statementPeriods(xbrlParser.periods, "8-K") == statements[0::2]
+
+
+def testPerShareFactsAreDecimals(syntheticFiling):
+    path = syntheticFiling()
+    xbrlParser, balanceDict, incomeDict = parse(path)
+    assert isinstance(incomeDict["EarningsPerShareBasic"], Decimal)
+
+
+@pytest.mark.parametrize("deiPosition", ["after-contexts", "last"])
+def testDEIHeaderPosition(syntheticFiling, deiPosition):
+    expected = parse(syntheticFiling())
+    xbrlParser, balanceDict, incomeDict = parse(syntheticFiling(deiPosition=deiPosition))
+    assert xbrlParser.CIK == expected[0].CIK
+    assert (balanceDict, incomeDict) == expected[1:]
+
+
+def testContextsOfAnotherEntityAreDropped(syntheticFiling):
+    path = syntheticFiling(deiPosition="last")
+    with open(path) as f:
+        document = f.read()
+    # Give the current period's duration context another filer's CIK
+    document = document.replace('<xbrli:context id="D0"><xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000320193',
+                                '<xbrli:context id="D0"><xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000789019')
+    with open(path, "w") as f:
+        f.write(document)
+
+    xbrlParser = XBRLParser(path, "etree")
+    extracted = xbrlParser.extractFiling()
+    assert "D0" not in extracted.DateContextDict
+    assert "I0" in extracted.DateContextDict
+    assert "D0" not in [contextID for contextIDs in extracted.ContextIndex.values() for contextID in contextIDs]
+
+
+def testExpandFilingPaths(tmp_path):
+    for name in ["a.xml", "a_cal.xml", "FilingSummary.xml", "notes.txt", "sub/b.xml", "sub/c.zip", "other/d.xml"]:
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text("")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# filings\nother/d.xml\n\n")
+
+    root = str(tmp_path)
+    filenames = XBRLToDicts.expandFilingPaths([os.path.join(root, "sub"), os.path.join(root, "a*.xml"),
+                                               os.path.join(root, "missing.xml")],
+                                              [str(manifest)])
+    assert filenames == [os.path.join(root, "other/d.xml"), os.path.join(root, "sub/b.xml"),
+                         os.path.join(root, "sub/c.zip"), os.path.join(root, "a.xml")]
+
+
+def testParseArchivedFiling(syntheticFiling, tmp_path):
+    path = syntheticFiling()
+    archive = str(tmp_path / "0000320193-15-000001.zip")
+    with zipfile.ZipFile(archive, "w") as zipFile:
+        zipFile.write(path, "aapl-20150926.xml")
+
+    expected = parse(path)
+    results = list(XBRLToDicts.parseFilings([archive], workers=1, engine="etree"))
+    assert len(results) == 1
+    name, result = results[0][:2]
+    assert name == archive + "!aapl-20150926.xml"
+    assert result[:3] == (expected[0].CIK, expected[1], expected[2])
+
+
+def testConceptWhitelist(syntheticFiling):
+    path = syntheticFiling()
+    concepts = frozenset(["NetIncomeLoss", "CashAndCashEquivalentsAtCarryingValue", "Assets"])
+    xbrlParser, balanceDict, incomeDict = parse(path, concepts=concepts)
+    assert set(incomeDict) == {"NetIncomeLoss"}
+    assert set(balanceDict) == {"CashAndCashEquivalentsAtCarryingValue", "Assets"}
+
+
+shortConceptList = frozenset(["NetIncomeLoss", "GrossProfit", "EarningsPerShareDiluted",
+                              "CashAndCashEquivalentsAtCarryingValue", "Assets", "LongTermDebtNoncurrent"])
+
+
+@pytest.mark.parametrize("conceptOrder", ["columns", "alphabetical"])
+@pytest.mark.parametrize("concepts", [XBRLToDicts.statementConcepts, shortConceptList])
+def testEarlyExitFindsTheCurrentPeriod(syntheticFiling, conceptOrder, concepts):
+    path = syntheticFiling(facts=20000, conceptOrder=conceptOrder)
+    full = parse(path, concepts=concepts)
+    early = parse(path, concepts=concepts, earlyExit=True)
+    assert early[0].metrics.elements < full[0].metrics.elements / 2
+    assert early[1] == full[1]
+    assert early[2] == full[2]
+
+
+def testEarlyExitWaitsForEveryConcept(syntheticFiling):
+    path = syntheticFiling(facts=20000, conceptOrder="alphabetical")
+    concepts = shortConceptList | {"NotInTheFiling"}
+    full = parse(path, concepts=concepts)
+    early = parse(path, concepts=concepts, earlyExit=True)
+    assert early[0].metrics.elements == full[0].metrics.elements
+
+
+def testMinContextFactsScalesWithConcepts():
+    assert XBRLToDicts.minContextFacts(None) == XBRLToDicts.ALL_CONCEPTS_MIN_FACTS
+    assert XBRLToDicts.minContextFacts(XBRLToDicts.statementConcepts) == XBRLToDicts.STATEMENT_CONCEPTS_MIN_FACTS
+    assert XBRLToDicts.minContextFacts(shortConceptList) == 1
+
+
+def testSelectPeriodsDefaultsToTheExtractionsMinFacts(syntheticFiling):
+    path = syntheticFiling()
+    xbrlParser = parse(path, concepts=shortConceptList)[0]
+    assert len(xbrlParser.periods) == 12
+
+    extracted = XBRLParser(path, "etree", concepts=shortConceptList).extractFiling()
+    assert extracted.minFacts == 1
+    assert len(selectPeriods(extracted)) == 12
+
+
+def testLxmlEngineFreesUnlistedElements(syntheticFiling):
+    pytest.importorskip("lxml")
+    # Text blocks all the way to the end of the document, after the last wanted fact
+    path = syntheticFiling(facts=3000, targetBytes=2 * 1024 * 1024)
+    usGAAP = "{http://fasb.org/us-gaap/2015-01-31}"
+    listed = [XBRLToDicts.contextTag, usGAAP + "NetIncomeLoss"]
+
+    yielded = []
+    root = None
+    for elem in XBRLToDicts.LxmlEngine().iterTopLevel(path, {}, lambda namespaceDict: listed + [usGAAP + "*"]):
+        yielded.append(elem.tag)
+        root = elem.getparent()
+
+    assert set(yielded) == set(listed)
+    # Only the last element handed over may be left in the tree
+    assert len(root) <= 1
@@ -0,0 +1,116 @@
+#
+# Find XBRL instance documents in EDGAR filing archives without unpacking them to disk.
+#
+# A filing archive is a .zip of one filing's documents, as EDGAR serves them. Bulk feed
+# archives (.zip or .tar, optionally gzipped or bzipped) hold many filings, usually as
+# nested filing .zip files. Instance documents are streamed straight out of them, so each
+# byte of an archive is read from disk once.
+#
+import fnmatch
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+
+# Linkbase and summary documents that sit next to the instance document in an EDGAR
+# filing directory. They are XML too, but have no facts in them.
+nonInstancePatterns = ["*_cal.xml", "*_def.xml", "*_lab.xml", "*_pre.xml", "FilingSummary.xml"]
+
+zipSuffixes = (".zip",)
+tarSuffixes = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# Separates an archive's path from the name of a member inside it, as in
+# "2015q3.tar.gz!0001193125-15-356351.zip!aapl-20150926.xml"
+MEMBER_SEPARATOR = "!"
+
+
+def isInstanceDocument(filename):
+    name = os.path.basename(filename)
+    if not name.lower().endswith(".xml"):
+        return False
+    for pattern in nonInstancePatterns:
+        if fnmatch.fnmatch(name, pattern):
+            return False
+    return True
+
+
+def archiveKind(filename):
+    """Return "zip" or "tar" for an archive file name, or None if it is not one."""
+    name = filename.lower()
+    if name.endswith(zipSuffixes):
+        return "zip"
+    if name.endswith(tarSuffixes):
+        return "tar"
+    return None
+
+
+def archivePath(name):
+    """Return the path of the outermost archive for a member name, or the name itself if
+    it is not inside an archive."""
+    return name.split(MEMBER_SEPARATOR, 1)[0]
+
+
+def metadataDigest(*fields):
+    """Build a cache key for an archive member out of what the archive says about it,
+    since hashing the contents would mean reading them before parsing them."""
+    return hashlib.sha256(":".join(str(field) for field in fields).encode("utf-8")).hexdigest()
+
+
+def iterZipMembers(zipFile, prefix):
+    for info in zipFile.infolist():
+        if info.is_dir():
+            continue
+        name = prefix + MEMBER_SEPARATOR + info.filename
+        kind = archiveKind(info.filename)
+        if kind is not None:
+            with zipFile.open(info) as f:
+                yield from iterNestedArchive(f, kind, name)
+        elif isInstanceDocument(info.filename):
+            with zipFile.open(info) as f:
+                # The name, time stamp, CRC and size come from the zip's central directory,
+                # so they identify the member without reading it. A CRC-32 and size alone
+                # could be shared by two different filings across a whole corpus.
+                digest = metadataDigest("zip", info.filename, info.date_time, info.CRC, info.file_size)
+                yield name, f, info.file_size, digest
+
+
+def iterTarMembers(tarFile, prefix):
+    for info in tarFile:
+        if not info.isfile():
+            continue
+        name = prefix + MEMBER_SEPARATOR + info.name
+        kind = archiveKind(info.name)
+        if kind is not None:
+            yield from iterNestedArchive(tarFile.extractfile(info), kind, name)
+        elif isInstanceDocument(info.name):
+            yield name, tarFile.extractfile(info), info.size, metadataDigest("tar", info.name, info.size, info.mtime)
+
+
+def iterNestedArchive(f, kind, name):
+    if kind == "zip":
+        # Reading a zip needs random access, so a nested one is read into memory. Filing
+        # archives are small, and this still only reads the bytes once.
+        with zipfile.ZipFile(io.BytesIO(f.read())) as zipFile:
+            yield from iterZipMembers(zipFile, name)
+    else:
+        with tarfile.open(fileobj=f, mode="r|*") as tarFile:
+            yield from iterTarMembers(tarFile, name)
+
+
+def iterArchiveFilings(path):
+    """Yield (name, fileobj, size, digest) for every instance document in an archive,
+    including those in archives nested inside it. The file object streams the member out
+    of the archive and is only valid until the next item is requested. digest is a cache
+    key derived from the archive's metadata for the member."""
+    kind = archiveKind(path)
+    if kind == "zip":
+        with zipfile.ZipFile(path) as zipFile:
+            yield from iterZipMembers(zipFile, path)
+    elif kind == "tar":
+        # Stream mode reads the archive front to back without seeking, which is what keeps
+        # compressed tarballs from being decompressed more than once
+        with tarfile.open(path, mode="r|*") as tarFile:
+            yield from iterTarMembers(tarFile, path)
+    else:
+        raise ValueError("Not a filing archive: " + path)
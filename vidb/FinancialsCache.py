@@ -0,0 +1,105 @@
+#
+# Read-through cache of cik_financials rows for the VI web site.
+#
+# Rows are kept in memory in least recently used order for up to a time to live, so hot
+# companies are served without a database round trip. The loader announces every CIK it
+# upserts, both to listeners in its own process and with a NOTIFY on the
+# cik_financials_changed channel, and the cache drops those CIKs as soon as it hears of
+# them, so a new filing shows up without waiting for the TTL.
+#
+import threading
+import time
+from collections import OrderedDict
+
+from vidb import LoadVIdbTable_CIKFinancials as loader
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 300.0
+
+
+class FinancialsCache:
+
+    def __init__(self, dsn=None, maxEntries=DEFAULT_MAX_ENTRIES, ttlSeconds=DEFAULT_TTL_SECONDS):
+        """Open a connection of our own and listen for loader notifications on it. It is
+        in autocommit mode: notifications are only delivered outside a transaction, and a
+        read-only cache has no use for one."""
+        self.maxEntries = maxEntries
+        self.ttlSeconds = ttlSeconds
+        # CIK -> (expiry time, row dict or None for a CIK with no row)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = loader.connect(dsn)
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute("LISTEN " + loader.INVALIDATION_CHANNEL)
+        loader.upsertListeners.append(self.invalidate)
+
+    def close(self):
+        if self.invalidate in loader.upsertListeners:
+            loader.upsertListeners.remove(self.invalidate)
+        self.conn.close()
+
+    def getFinancials(self, CIK):
+        """Return a company's cik_financials row as a dict of column values, or None if
+        it has none."""
+        return self.getMany([CIK]).get(CIK)
+
+    def getMany(self, CIKs):
+        """Return {CIK: row dict or None} for several companies, fetching all the ones not
+        in the cache with a single query."""
+        with self.lock:
+            self.pollInvalidations()
+            now = time.monotonic()
+            found = {}
+            missing = []
+            for CIK in CIKs:
+                entry = self.entries.get(CIK)
+                if entry is not None and entry[0] > now:
+                    self.entries.move_to_end(CIK)
+                    found[CIK] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(CIK)
+            if not missing:
+                return found
+
+            self.misses += len(missing)
+            rows = self.fetchRows(missing)
+            expiry = now + self.ttlSeconds
+            for CIK in missing:
+                # Companies without a row are cached too, so a bad ticker does not keep
+                # hitting the database
+                row = rows.get(CIK)
+                self.entries[CIK] = (expiry, row)
+                self.entries.move_to_end(CIK)
+                found[CIK] = row
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+            return found
+
+    def fetchRows(self, CIKs):
+        columnList = ", ".join(loader.quoteColumn(name) for name in loader.CIKFinancialsColumnNames)
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT " + columnList + " FROM cik_financials WHERE cik = ANY(%s)", (list(CIKs),))
+            return {row[0]: dict(zip(loader.CIKFinancialsColumnNames, row)) for row in cur.fetchall()}
+
+    def pollInvalidations(self):
+        """Drop the CIKs named in any notifications that have arrived. poll() only reads
+        what is already waiting on the socket, so this costs no round trip."""
+        self.conn.poll()
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            for CIK in loader.parseChangedCIKs(notify.payload):
+                self.entries.pop(CIK, None)
+
+    def invalidate(self, CIKs):
+        with self.lock:
+            for CIK in CIKs:
+                self.entries.pop(CIK, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
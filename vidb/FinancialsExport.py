@@ -0,0 +1,138 @@
+#
+# Export parsed financials to Parquet or Arrow IPC files for research jobs.
+#
+# Each annual or quarterly statement period of each filing becomes one row, with the
+# cik_financials columns as typed columns: int64 for amounts, decimal for per-share
+# amounts. Files are partitioned by the year of the period end, Hive style
+# (year=2015/...), so a scan of a range of years only opens those directories. Arrow IPC
+# files are written uncompressed so they can be memory mapped and read without copying.
+#
+# pyarrow is only needed here, and is imported when an export is started.
+#
+import os
+import time
+from decimal import Decimal
+
+from vidb.LoadVIdbTable_CIKFinancials import CIKFinancialsColumns, convertValue
+
+# File name extensions and pyarrow.dataset format names
+exportFormats = {
+    "parquet": ("parquet", ".parquet"),
+    "arrow": ("ipc", ".arrow"),
+}
+
+MONEY_SCALE = Decimal("0.0001")
+
+
+def importPyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.fs
+    except ImportError:
+        raise ImportError("Exporting to Parquet or Arrow needs pyarrow; install it with: pip install pyarrow") from None
+    return pyarrow
+
+
+def exportSchema(pa):
+    fields = [
+        pa.field("cik", pa.int32(), nullable=False),
+        pa.field("year", pa.int16(), nullable=False),
+        pa.field("period_type", pa.string(), nullable=False),
+        pa.field("period_start", pa.date32()),
+        pa.field("period_end", pa.date32(), nullable=False),
+    ]
+    for name, sqlType in CIKFinancialsColumns[1:]:
+        fields.append(pa.field(name, pa.decimal128(19, 4) if sqlType == "money" else pa.int64()))
+    return pa.schema(fields)
+
+
+def statementRecords(CIK, statements):
+    """Yield one dict per annual or quarterly period in a filing's statementPeriods(), with
+    the balance sheet facts at its end date merged in."""
+    instants = {periodEnd: facts for periodType, periodStart, periodEnd, facts in statements
+                if periodType == "instant"}
+    for periodType, periodStart, periodEnd, facts in statements:
+        if periodType == "instant":
+            continue
+        values = dict(instants.get(periodEnd, {}))
+        values.update(facts)
+
+        record = {
+            "cik": CIK,
+            "year": periodEnd.year,
+            "period_type": periodType,
+            "period_start": periodStart.date() if periodStart is not None else None,
+            "period_end": periodEnd.date(),
+        }
+        for name, sqlType in CIKFinancialsColumns[1:]:
+            value = values.get(name)
+            if value is not None:
+                # The same checks and warnings as loading into the database
+                value = convertValue(CIK, name, sqlType, value)
+            if value is not None:
+                value = Decimal(value).quantize(MONEY_SCALE) if sqlType == "money" else int(value)
+            record[name] = value
+        yield record
+
+
+class FinancialsExporter:
+
+    def __init__(self, directory, format="parquet", rowsPerFile=100000):
+        """Write to directory in the given format, "parquet" or "arrow". Each run adds
+        files of its own, so exports of different batches of filings can share one
+        directory."""
+        if format not in exportFormats:
+            raise ValueError("Unknown export format: " + format)
+        self.pa = importPyarrow()
+        self.directory = directory
+        self.datasetFormat, self.extension = exportFormats[format]
+        self.rowsPerFile = rowsPerFile
+        self.schema = exportSchema(self.pa)
+        self.partitioning = self.pa.dataset.partitioning(self.pa.schema([self.schema.field("year")]), flavor="hive")
+        self.runName = time.strftime("%Y%m%dT%H%M%S") + "-" + str(os.getpid())
+        self.records = []
+        self.files = 0
+        self.rows = 0
+
+    def add(self, filing):
+        """Add a (CIK, InstantContextData, DateRangeContextData, statements) tuple, as
+        parseFilings() returns them."""
+        CIK, balanceDict, incomeDict, statements = filing
+        if not CIK:
+            return
+        self.records.extend(statementRecords(CIK, statements))
+        if len(self.records) >= self.rowsPerFile:
+            self.flush()
+
+    def flush(self):
+        if not self.records:
+            return
+        table = self.pa.Table.from_pylist(self.records, schema=self.schema)
+        fileOptions = None
+        if self.datasetFormat == "ipc":
+            # Compressed buffers would have to be decompressed into memory to be read
+            fileOptions = self.pa.dataset.IpcFileFormat().make_write_options(compression=None)
+        self.pa.dataset.write_dataset(table, self.directory, format=self.datasetFormat,
+                                      partitioning=self.partitioning, file_options=fileOptions,
+                                      basename_template=self.runName + "-" + str(self.files) + "-{i}" + self.extension,
+                                      existing_data_behavior="overwrite_or_ignore")
+        self.files += 1
+        self.rows += len(self.records)
+        self.records = []
+
+    def close(self):
+        """Write out what is left and return the number of rows exported."""
+        self.flush()
+        return self.rows
+
+
+def readExport(directory, format="parquet", columns=None, filter=None):
+    """Read an export back as a pyarrow Table, optionally just some columns or the rows
+    matching a pyarrow.dataset expression, such as pyarrow.dataset.field("year") >= 2012.
+    Files are memory mapped, so Arrow IPC exports are read without copying."""
+    pa = importPyarrow()
+    datasetFormat, extension = exportFormats[format]
+    dataset = pa.dataset.dataset(directory, format=datasetFormat, partitioning="hive",
+                                 filesystem=pa.fs.LocalFileSystem(use_mmap=True))
+    return dataset.to_table(columns=columns, filter=filter)
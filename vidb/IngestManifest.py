@@ -0,0 +1,88 @@
+#
+# Local record of the filings that have already been ingested, so that re-running the
+# pipeline only parses and loads filings that are new or have changed.
+#
+# The manifest is a SQLite database with one row per filing, keyed by accession number,
+# holding the content hash of the instance document and when it was parsed.
+#
+import hashlib
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+# EDGAR accession numbers look like 0001193125-15-356351, or without the dashes in the
+# directory names of the EDGAR archive
+accessionPattern = re.compile(r"(\d{10})-?(\d{2})-?(\d{6})")
+
+
+def accessionNumber(path):
+    """Return the accession number of the filing a path belongs to, or the absolute path
+    if there is none in it."""
+    matches = accessionPattern.findall(path)
+    if matches:
+        return "-".join(matches[-1])
+    return os.path.abspath(path)
+
+
+def fileDigest(path, chunkSize=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunkSize), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """The set of filings already parsed, with enough about each to tell if it changed."""
+
+    def __init__(self, filename):
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS filings ("
+                          "accession TEXT PRIMARY KEY, "
+                          "path TEXT NOT NULL, "
+                          "size INTEGER NOT NULL, "
+                          "mtime REAL NOT NULL, "
+                          "sha256 TEXT NOT NULL, "
+                          "cik INTEGER, "
+                          "parsed_at TEXT NOT NULL)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def checkFiling(self, path):
+        """Return (accession, size, mtime, sha256) for a filing that is new or has changed
+        since it was recorded, or None if it is unchanged.
+
+        A file whose size and modification time match the manifest is taken to be
+        unchanged without hashing it. Otherwise its content hash decides, so touching a
+        file does not cause it to be reparsed."""
+        accession = accessionNumber(path)
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime, sha256 FROM filings WHERE accession = ?",
+                                (accession,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return None
+
+        sha256 = fileDigest(path)
+        if row is not None and row[2] == sha256:
+            # Same contents; just remember the new timestamp so the next check is cheap
+            with self.conn:
+                self.conn.execute("UPDATE filings SET path = ?, size = ?, mtime = ? WHERE accession = ?",
+                                  (path, stat.st_size, stat.st_mtime, accession))
+            return None
+
+        return accession, stat.st_size, stat.st_mtime, sha256
+
+    def recordFilings(self, filings):
+        """Record parsed filings as (path, (accession, size, mtime, sha256), CIK) tuples,
+        all in one transaction."""
+        parsedAt = datetime.now(timezone.utc).isoformat()
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO filings "
+                                  "(accession, path, size, mtime, sha256, cik, parsed_at) "
+                                  "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  [(state[0], path, state[1], state[2], state[3], CIK, parsedAt)
+                                   for path, state, CIK in filings])
@@ -0,0 +1,149 @@
+#
+# Staged ingest pipeline: filings are read and parsed by the worker pool while a set of
+# writer threads batch the results into cik_financials and cik_facts over pooled
+# connections, updating cik_ratios for the companies in each batch as they go.
+#
+#     reader -> parser workers -> bounded queue -> writer threads -> PostgreSQL
+#
+# The queue between the parsers and the writers is bounded, so if the database falls
+# behind, parsing is held back instead of buffering an unbounded number of results, and
+# while the writers are busy with a batch the parsers keep going. Each writer thread
+# owns a connection from the pool for the life of the pipeline.
+#
+import queue
+import sys
+import threading
+
+from vidb import LoadVIdbTable_CIKFacts as factLoader
+from vidb import LoadVIdbTable_CIKFinancials as loader
+from vidb import LoadVIdbTable_CIKRatios as ratioLoader
+
+# Put on the queue once per writer to tell it to flush and stop
+STOP = object()
+
+
+class IngestPipeline:
+
+    def __init__(self, dsn=None, writers=2, batchSize=1000, queueSize=None, flushSeconds=5.0):
+        """writers is the number of writer threads and pooled connections. Each writer
+        commits a batch once it has batchSize filings, or once flushSeconds pass without a
+        new filing arriving. queueSize bounds the filings waiting for a writer; it defaults
+        to one batch per writer."""
+        # Imported here so the rest of the loader can be used without psycopg2 installed
+        import psycopg2.pool
+
+        self.writers = writers
+        self.batchSize = batchSize
+        self.flushSeconds = flushSeconds
+        self.queue = queue.Queue(maxsize=queueSize or batchSize * writers)
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, writers, loader.defaultDSN(dsn))
+
+        self.lock = threading.Lock()
+        self.loaded = 0
+        self.error = None
+        self.threads = [threading.Thread(target=self.writeLoop, name="writer-" + str(i), daemon=True)
+                        for i in range(writers)]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, filing):
+        """Queue a (CIK, InstantContextData, DateRangeContextData, statements) tuple, as
+        parseFilings() returns them, for loading. Blocks while the queue is full."""
+        while True:
+            if self.error is not None:
+                raise RuntimeError("Ingest pipeline writer failed") from self.error
+            try:
+                self.queue.put(filing, timeout=1.0)
+                return
+            except queue.Full:
+                pass
+
+    def close(self):
+        """Flush everything still queued, stop the writers, refresh cik_statements and
+        return the number of filings written. Raises if any writer failed."""
+        # Failed writers keep draining the queue, so these always get through
+        for thread in self.threads:
+            self.queue.put(STOP)
+        for thread in self.threads:
+            thread.join()
+
+        try:
+            if self.error is not None:
+                raise RuntimeError("Ingest pipeline writer failed") from self.error
+            if self.loaded:
+                # Once per run rather than per batch, since it rebuilds the whole view
+                conn = self.pool.getconn()
+                try:
+                    factLoader.refreshStatements(conn)
+                finally:
+                    self.pool.putconn(conn)
+        finally:
+            self.pool.closeall()
+        return self.loaded
+
+    def writeLoop(self):
+        conn = None
+        batch = []
+        try:
+            conn = self.pool.getconn()
+            while True:
+                try:
+                    filing = self.queue.get(timeout=self.flushSeconds)
+                except queue.Empty:
+                    # Parsing has gone quiet; commit what we have rather than sit on it
+                    self.flush(conn, batch)
+                    continue
+
+                if filing is STOP:
+                    self.flush(conn, batch)
+                    return
+
+                if not filing[0]:
+                    print("Skipping filing without a central index key", file=sys.stderr)
+                    continue
+                batch.append(filing)
+                if len(batch) >= self.batchSize:
+                    self.flush(conn, batch)
+        except Exception as e:
+            print("Writer " + threading.current_thread().name + " failed: " + repr(e), file=sys.stderr)
+            self.error = e
+            # Keep draining so the producer is never left blocked on a full queue
+            while self.queue.get() is not STOP:
+                pass
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn)
+
+    def flush(self, conn, batch):
+        if not batch:
+            return
+        writeBatch(conn, batch)
+        with self.lock:
+            self.loaded += len(batch)
+        batch.clear()
+
+
+def writeBatch(conn, batch):
+    """Write a batch of (CIK, InstantContextData, DateRangeContextData, statements) filings
+    to all the tables in one transaction."""
+    # A CIK seen twice within a batch keeps its last row. Filings without current period
+    # data still add their periods to cik_facts, but leave cik_financials be.
+    rows = {}
+    for CIK, balanceDict, incomeDict, statements in batch:
+        row = loader.filingToRow(CIK, balanceDict, incomeDict,
+                                 loader.currentPeriodEnd(balanceDict, incomeDict, statements))
+        if loader.hasStatementData(row):
+            rows[CIK] = row
+        else:
+            print("CIK " + str(CIK) + ": no current period statement data for cik_financials", file=sys.stderr)
+    facts = factLoader.factRows(batch)
+
+    factLoader.ensurePartitions(conn, factLoader.rowYears(facts))
+    CIKs = sorted(rows)
+    with conn:
+        with conn.cursor() as cur:
+            if rows:
+                loader.mergeRows(cur, [rows[CIK] for CIK in CIKs])
+            factLoader.mergeFacts(cur, facts)
+            ratioLoader.updateRatios(cur, CIKs)
+    loader.announceUpserted(CIKs)
@@ -0,0 +1,175 @@
+#
+# Load the statement periods of parsed filings into the cik_facts time-series table, and
+# query it for the VI web site.
+#
+# cik_facts holds one row per (cik, period_end, period_type, concept), so unlike
+# cik_financials it keeps every period of every company: the current period of each
+# filing and the comparative periods reported alongside it. It is partitioned by the year
+# of period_end. cik_statements is a materialized view pivoting it back into one wide row
+# per company and statement period, with the cik_financials columns, for the site.
+#
+import sys
+from decimal import Decimal, InvalidOperation
+
+from vidb.LoadVIdbTable_CIKFinancials import CIKFinancialsColumns, convertValue, copyRows, quoteColumn
+
+CIKFactsColumnNames = ["cik", "period_end", "period_type", "concept", "period_start", "value"]
+
+# Statement period types: balance sheet facts are 'instant', the income and cash flow
+# statements are 'annual' (10-K) or 'quarter' (10-Q)
+periodTypes = ("instant", "annual", "quarter")
+
+# The first year with XBRL filings on EDGAR. Partitions from here to next year are made
+# when the schema is created; others are added as filings for them are loaded.
+FIRST_PARTITION_YEAR = 2009
+
+# The SQL type of each concept with a cik_financials column. cik_statements casts their
+# values to it, so they are range checked the same way before they go in cik_facts.
+statementConceptTypes = dict(CIKFinancialsColumns[1:])
+
+# Years known to have a partition, so the catalog is not asked on every batch
+knownPartitionYears = set()
+
+
+def partitionName(year):
+    return "cik_facts_y" + str(year)
+
+
+def partitionStatements(years):
+    """The statements creating the cik_facts partitions for the given years if they do not
+    exist."""
+    # Serialize partition creation between concurrent loaders, whose CREATE TABLE IF NOT
+    # EXISTS could otherwise race each other
+    statements = ["SELECT pg_advisory_xact_lock(hashtext('cik_facts partitions'))"]
+    for year in sorted(years):
+        statements.append("CREATE TABLE IF NOT EXISTS " + partitionName(year) + " PARTITION OF cik_facts " +
+                          "FOR VALUES FROM ('" + str(year) + "-01-01') TO ('" + str(year + 1) + "-01-01')")
+    return statements
+
+
+def createPartitions(cur, years):
+    """Create the cik_facts partitions for the given years if they do not exist."""
+    cur.execute(";\n".join(partitionStatements(years)))
+
+
+def ensurePartitions(conn, years):
+    """Make sure cik_facts has a partition for each year. This runs in its own short
+    transaction: creating a partition locks the whole table, which must not happen while
+    holding row locks in a load transaction."""
+    missing = set(years) - knownPartitionYears
+    if not missing:
+        return
+    with conn:
+        with conn.cursor() as cur:
+            createPartitions(cur, missing)
+    knownPartitionYears.update(missing)
+
+
+def factRows(filings):
+    """Turn (CIK, InstantContextData, DateRangeContextData, statements) tuples into
+    cik_facts rows keyed by (cik, period_end, period_type, concept). Where a batch holds the
+    same key twice, as a period reported again as the comparative in a later filing, the
+    later filing wins. Values of the statement concepts that would not fit their
+    cik_statements column are left out, as they are from cik_financials."""
+    rows = {}
+    for CIK, balanceDict, incomeDict, statements in filings:
+        if not CIK:
+            continue
+        for periodType, periodStart, periodEnd, facts in statements:
+            periodEndText = periodEnd.strftime("%Y-%m-%d")
+            periodStartText = None if periodStart is None else periodStart.strftime("%Y-%m-%d")
+            for concept, value in facts.items():
+                sqlType = statementConceptTypes.get(concept)
+                if sqlType is not None:
+                    value = convertValue(CIK, concept, sqlType, value)
+                    if value is None:
+                        continue
+                else:
+                    try:
+                        value = Decimal(value)
+                    except InvalidOperation:
+                        print("CIK " + str(CIK) + ": " + concept + " value '" + str(value) + "' is not a number", file=sys.stderr)
+                        continue
+                rows[(CIK, periodEnd, periodType, concept)] = [
+                    str(CIK), periodEndText, periodType, concept, periodStartText, str(value)]
+    return rows
+
+
+def mergeFacts(cur, rows):
+    """Merge cik_facts rows from factRows() via a staging table, inside the cursor's current
+    transaction. The partitions for the rows' years must already exist."""
+    columnList = ", ".join(CIKFactsColumnNames)
+    cur.execute("CREATE TEMP TABLE cik_facts_stage (LIKE cik_facts) ON COMMIT DROP")
+    # Sorted by key so concurrent writers take their row locks in the same order
+    copyRows(cur, "cik_facts_stage", (rows[key] for key in sorted(rows)), CIKFactsColumnNames)
+    cur.execute("INSERT INTO cik_facts (" + columnList + ") " +
+                "SELECT " + columnList + " FROM cik_facts_stage " +
+                "ORDER BY cik, period_end, period_type, concept " +
+                "ON CONFLICT (cik, period_end, period_type, concept) DO UPDATE SET " +
+                "period_start = EXCLUDED.period_start, value = EXCLUDED.value")
+
+
+def rowYears(rows):
+    return {periodEnd.year for CIK, periodEnd, periodType, concept in rows}
+
+
+def refreshStatements(conn):
+    """Rebuild cik_statements from cik_facts. CONCURRENTLY keeps the site reading the old
+    contents while it runs."""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY cik_statements")
+
+
+def statementColumns():
+    """The (name, sqlType) columns of cik_statements after its key: the cik_financials
+    columns, with money ones as numeric."""
+    return [(name, "numeric" if sqlType == "money" else sqlType) for name, sqlType in CIKFinancialsColumns[1:]]
+
+
+def statementsViewSQL():
+    """The query behind cik_statements. Each annual or quarterly period gets one row,
+    with the date range facts for the period and the instant facts at its end date."""
+    pivot = ", ".join("max(f.value) FILTER (WHERE f.concept = '" + name + "')::" + sqlType + " AS " + quoteColumn(name)
+                      for name, sqlType in statementColumns())
+    return ("SELECT p.cik, p.period_end, p.period_type, p.period_start, " + pivot + " " +
+            "FROM (SELECT cik, period_end, period_type, min(period_start) AS period_start " +
+            "      FROM cik_facts WHERE period_type <> 'instant' " +
+            "      GROUP BY cik, period_end, period_type) p " +
+            "JOIN cik_facts f ON f.cik = p.cik AND f.period_end = p.period_end " +
+            "                AND f.period_type IN (p.period_type, 'instant') " +
+            "GROUP BY p.cik, p.period_end, p.period_type, p.period_start")
+
+
+# The site's two queries. Both are an index lookup on ticker_cik followed by a range scan
+# of the cik_statements_key index, so they stay fast however much history there is.
+latestStatementSQL = ("SELECT s.* FROM ticker_cik t JOIN cik_statements s ON s.cik = t.cik " +
+                      "WHERE t.ticker = %s AND s.period_type = %s " +
+                      "ORDER BY s.period_end DESC LIMIT 1")
+
+statementHistorySQL = ("SELECT s.* FROM ticker_cik t JOIN cik_statements s ON s.cik = t.cik " +
+                       "WHERE t.ticker = %s AND s.period_type = %s " +
+                       "AND s.period_end > current_date - make_interval(years => %s) " +
+                       "ORDER BY s.period_end DESC")
+
+
+def fetchDicts(cur):
+    names = [column[0] for column in cur.description]
+    return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def latestStatement(conn, ticker, periodType="annual"):
+    """Return the latest annual (or quarterly) statement for a ticker as a dict of column
+    values, or None."""
+    with conn.cursor() as cur:
+        cur.execute(latestStatementSQL, (ticker.upper(), periodType))
+        rows = fetchDicts(cur)
+    return rows[0] if rows else None
+
+
+def statementHistory(conn, ticker, years=10, periodType="annual"):
+    """Return a ticker's statements ending within the last given number of years, latest
+    first."""
+    with conn.cursor() as cur:
+        cur.execute(statementHistorySQL, (ticker.upper(), periodType, years))
+        return fetchDicts(cur)
@@ -0,0 +1,244 @@
+#
+# Load the dictionaries produced by XBRLParser.parseFiling() into the cik_financials table.
+#
+# Rows are written in batches by IngestPipeline: each batch is streamed into a temporary
+# staging table with COPY FROM STDIN and then merged into cik_financials with a single
+# INSERT ... ON CONFLICT, so a batch costs one transaction and a handful of round trips no
+# matter how many filings are in it.
+#
+import csv
+import io
+import os
+import sys
+from decimal import Decimal, InvalidOperation
+
+# The columns of cik_financials, in table order, with their SQL types. Every column
+# other than cik is named after the US GAAP term it holds.
+CIKFinancialsColumns = [
+    ("cik", "integer"),
+    ("SalesRevenueNet", "bigint"),
+    ("CostOfGoodsAndServicesSold", "bigint"),
+    ("GrossProfit", "bigint"),
+    ("ResearchAndDevelopmentExpense", "bigint"),
+    ("SellingGeneralAndAdministrativeExpense", "bigint"),
+    ("OperatingExpenses", "bigint"),
+    ("OperatingIncomeLoss", "bigint"),
+    ("NonoperatingIncomeExpense", "bigint"),
+    ("IncomeLossFromContinuingOperationsBeforeIncomeTaxesExtraordinaryItemsNoncontrollingInterest", "bigint"),
+    ("IncomeTaxExpenseBenefit", "bigint"),
+    ("NetIncomeLoss", "bigint"),
+    ("EarningsPerShareBasic", "money"),
+    ("EarningsPerShareDiluted", "money"),
+    ("WeightedAverageNumberOfSharesOutstandingBasic", "bigint"),
+    ("WeightedAverageNumberOfDilutedSharesOutstanding", "bigint"),
+    ("CommonStockDividendsPerShareDeclared", "money"),
+    ("OtherComprehensiveIncomeLossNetOfTax", "bigint"),
+    ("ComprehensiveIncomeNetOfTax", "bigint"),
+    ("CashAndCashEquivalentsAtCarryingValue", "bigint"),
+    ("AvailableForSaleSecuritiesCurrent", "bigint"),
+    ("AccountsReceivableNetCurrent", "bigint"),
+    ("InventoryNet", "bigint"),
+    ("DeferredTaxAssetsLiabilitiesNetCurrent", "bigint"),
+    ("NontradeReceivablesCurrent", "bigint"),
+    ("AssetsCurrent", "bigint"),
+    ("AvailableForSaleSecuritiesNoncurrent", "bigint"),
+    ("PropertyPlantAndEquipmentNet", "bigint"),
+    ("Goodwill", "bigint"),
+    ("IntangibleAssetsNetExcludingGoodwill", "bigint"),
+    ("OtherAssetsNoncurrent", "bigint"),
+    ("Assets", "bigint"),
+    ("AccountsPayableCurrent", "bigint"),
+    ("AccruedLiabilitiesCurrent", "bigint"),
+    ("DeferredRevenueCurrent", "bigint"),
+    ("CommercialPaper", "bigint"),
+    ("LongTermDebtCurrent", "bigint"),
+    ("LiabilitiesCurrent", "bigint"),
+    ("DeferredRevenueNoncurrent", "bigint"),
+    ("LongTermDebtNoncurrent", "bigint"),
+    ("OtherLiabilitiesNoncurrent", "bigint"),
+    ("Liabilities", "bigint"),
+    ("CommonStocksIncludingAdditionalPaidInCapital", "bigint"),
+    ("RetainedEarningsAccumulatedDeficit", "bigint"),
+    ("AccumulatedOtherComprehensiveIncomeLossNetOfTax", "bigint"),
+    ("StockholdersEquity", "bigint"),
+    ("LiabilitiesAndStockholdersEquity", "bigint"),
+    ("DepreciationAmortizationAndAccretionNet", "bigint"),
+    ("ShareBasedCompensation", "bigint"),
+    ("DeferredIncomeTaxExpenseBenefit", "bigint"),
+    ("IncreaseDecreaseInAccountsReceivable", "bigint"),
+    ("IncreaseDecreaseInInventories", "bigint"),
+    ("IncreaseDecreaseInOtherOperatingAssets", "bigint"),
+    ("IncreaseDecreaseInAccountsPayable", "bigint"),
+    ("IncreaseDecreaseInDeferredRevenue", "bigint"),
+    ("IncreaseDecreaseInOtherOperatingLiabilities", "bigint"),
+    ("NetCashProvidedByUsedInOperatingActivitiesContinuingOperations", "bigint"),
+    ("PaymentsToAcquireAvailableForSaleSecurities", "bigint"),
+    ("ProceedsFromMaturitiesPrepaymentsAndCallsOfAvailableForSaleSecurities", "bigint"),
+    ("ProceedsFromSaleOfAvailableForSaleSecurities", "bigint"),
+    ("PaymentsToAcquireBusinessesNetOfCashAcquired", "bigint"),
+    ("PaymentsToAcquirePropertyPlantAndEquipment", "bigint"),
+    ("PaymentsToAcquireIntangibleAssets", "bigint"),
+    ("PaymentsForProceedsFromOtherInvestingActivities", "bigint"),
+    ("NetCashProvidedByUsedInInvestingActivitiesContinuingOperations", "bigint"),
+    ("ProceedsFromIssuanceOfCommonStock", "bigint"),
+    ("ExcessTaxBenefitFromShareBasedCompensationFinancingActivities", "bigint"),
+    ("PaymentsRelatedToTaxWithholdingForShareBasedCompensation", "bigint"),
+    ("PaymentsForRepurchaseOfCommonStock", "bigint"),
+    ("ProceedsFromIssuanceOfLongTermDebt", "bigint"),
+    ("ProceedsFromRepaymentsOfCommercialPaper", "bigint"),
+    ("NetCashProvidedByUsedInFinancingActivitiesContinuingOperations", "bigint"),
+    ("CashAndCashEquivalentsPeriodIncreaseDecrease", "bigint"),
+]
+
+CIKFinancialsColumnNames = [name for name, sqlType in CIKFinancialsColumns]
+
+# Each row also records the end of the statement period its values were taken from, so
+# that a filing loaded out of order cannot replace a later period's row with an older one
+PeriodEndColumn = ("period_end", "date")
+CIKFinancialsRowColumnNames = CIKFinancialsColumnNames + [PeriodEndColumn[0]]
+
+# Each batch of CIKs upserted is announced with a NOTIFY on this channel, as a comma
+# separated list, so query caches in other processes can drop them
+INVALIDATION_CHANNEL = "cik_financials_changed"
+
+# PostgreSQL limits a notification payload to 8000 bytes
+MAX_NOTIFY_PAYLOAD = 7900
+
+# Callables run with the list of CIKs in each batch once it is committed, for caches in
+# this process
+upsertListeners = []
+
+# Range of the SQL bigint type. Big filers' revenue and assets overflow integer.
+BIGINT_MIN = -2**63
+BIGINT_MAX = 2**63 - 1
+
+
+def defaultDSN(dsn=None):
+    """Return the connection string to use: the argument, then the VIDB_DSN environment
+    variable. Passwords belong in PGPASSWORD or ~/.pgpass, not in the source."""
+    if dsn is None:
+        dsn = os.environ.get("VIDB_DSN", "dbname=stocks_us user=postgres")
+    return dsn
+
+
+def connect(dsn=None):
+    """Open a connection to the VI database."""
+    # Imported here so the column definitions can be used without psycopg2 installed
+    import psycopg2
+
+    return psycopg2.connect(defaultDSN(dsn))
+
+
+def quoteColumn(name):
+    return '"' + name + '"'
+
+
+def convertValue(CIK, column, sqlType, text):
+    """Convert a GAAP fact value (an int, a Decimal or the fact's text) to the value written
+    for the given column, or None if it cannot be stored there."""
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        print("CIK " + str(CIK) + ": " + column + " value '" + str(text) + "' is not a number", file=sys.stderr)
+        return None
+
+    if sqlType == "money":
+        return str(value)
+
+    if value != value.to_integral_value():
+        print("CIK " + str(CIK) + ": " + column + " value " + str(text) + " is not an integer", file=sys.stderr)
+        return None
+    value = int(value)
+    if value < BIGINT_MIN or value > BIGINT_MAX:
+        print("CIK " + str(CIK) + ": " + column + " value " + str(text) + " overflows bigint", file=sys.stderr)
+        return None
+    return str(value)
+
+
+def currentPeriodEnd(balanceDict, incomeDict, statements):
+    """The period end of the current period dictionaries, looked up among the filing's
+    (periodType, periodStart, periodEnd, facts) statements. None if they are not there."""
+    for periodType, periodStart, periodEnd, facts in statements:
+        if facts and (facts == balanceDict or facts == incomeDict):
+            return periodEnd
+    return None
+
+
+def filingToRow(CIK, balanceDict, incomeDict, periodEnd=None):
+    """Map the instant (balance sheet) and date range (income and cash flow) dictionaries
+    from one filing onto a cik_financials row, as a list of values for
+    CIKFinancialsRowColumnNames. periodEnd is the date they are for."""
+    row = [str(CIK)]
+    for column, sqlType in CIKFinancialsColumns[1:]:
+        text = None
+        if incomeDict and column in incomeDict:
+            text = incomeDict[column]
+        elif balanceDict and column in balanceDict:
+            text = balanceDict[column]
+        row.append(None if text is None else convertValue(CIK, column, sqlType, text))
+    row.append(None if periodEnd is None else periodEnd.strftime("%Y-%m-%d"))
+    return row
+
+
+def hasStatementData(row):
+    """Whether a row from filingToRow() has any values. A filing whose current period
+    could not be selected, or whose form type has no statement length, has none, and must
+    not be merged over the company's existing row."""
+    return any(value is not None for value in row[1:len(CIKFinancialsColumns)])
+
+
+def copyRows(cur, table, rows, columnNames=CIKFinancialsColumnNames):
+    """Stream rows into the given table with COPY FROM STDIN."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for row in rows:
+        # Unquoted empty fields are NULL in COPY's CSV format
+        writer.writerow(["" if value is None else value for value in row])
+    buf.seek(0)
+
+    columnList = ", ".join(quoteColumn(name) for name in columnNames)
+    cur.copy_expert("COPY " + table + " (" + columnList + ") FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def mergeRows(cur, rows):
+    """Merge a list of rows from filingToRow() into cik_financials via a staging table,
+    inside the cursor's current transaction. A row replaces the company's existing one as
+    a whole, so values from different periods are never mixed, but only if its period
+    ends no earlier than the existing row's."""
+    columnList = ", ".join(quoteColumn(name) for name in CIKFinancialsRowColumnNames)
+    updateList = ", ".join(quoteColumn(name) + " = EXCLUDED." + quoteColumn(name)
+                           for name in CIKFinancialsRowColumnNames[1:])
+
+    cur.execute("CREATE TEMP TABLE cik_financials_stage (LIKE cik_financials) ON COMMIT DROP")
+    copyRows(cur, "cik_financials_stage", rows, CIKFinancialsRowColumnNames)
+    # Rows are merged in CIK order so that concurrent writers always take their row
+    # locks in the same order and cannot deadlock. Rows loaded before period_end was
+    # added have none, and are always replaced.
+    cur.execute("INSERT INTO cik_financials (" + columnList + ") " +
+                "SELECT " + columnList + " FROM cik_financials_stage ORDER BY cik " +
+                "ON CONFLICT (cik) DO UPDATE SET " + updateList + " " +
+                "WHERE cik_financials.period_end IS NULL OR EXCLUDED.period_end >= cik_financials.period_end")
+    notifyChanged(cur, [row[0] for row in rows])
+
+
+def notifyChanged(cur, CIKs):
+    """Queue notifications naming the changed CIKs. PostgreSQL only sends them when the
+    transaction commits, so listeners never hear of rows they cannot see yet."""
+    payload = ""
+    for CIK in CIKs:
+        if len(payload) + len(str(CIK)) + 1 > MAX_NOTIFY_PAYLOAD:
+            cur.execute("SELECT pg_notify(%s, %s)", (INVALIDATION_CHANNEL, payload))
+            payload = ""
+        payload += ("," if payload else "") + str(CIK)
+    if payload:
+        cur.execute("SELECT pg_notify(%s, %s)", (INVALIDATION_CHANNEL, payload))
+
+
+def parseChangedCIKs(payload):
+    return [int(CIK) for CIK in payload.split(",") if CIK]
+
+
+def announceUpserted(CIKs):
+    """Tell this process's listeners about a committed batch."""
+    for listener in upsertListeners:
+        listener(CIKs)
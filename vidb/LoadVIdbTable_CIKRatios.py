@@ -0,0 +1,61 @@
+#
+# Maintain the cik_ratios table of value-investing ratios derived from cik_financials.
+#
+# The ratios are computed by PostgreSQL in one set-based INSERT ... SELECT over
+# cik_financials rather than row by row in Python, and only for the companies whose
+# filings were just loaded, inside the same transaction, so cik_ratios is never out of
+# step with cik_financials. Screens over all companies then read one indexed table.
+#
+from vidb.LoadVIdbTable_CIKFinancials import quoteColumn
+
+
+def column(name):
+    return quoteColumn(name) + "::numeric"
+
+
+def ratio(numerator, denominator):
+    # NULL rather than a division by zero error when the denominator is zero
+    return numerator + " / NULLIF(" + denominator + ", 0)"
+
+
+# Debt is what the filer reports of commercial paper and long-term debt, both current and
+# noncurrent. It is NULL only when none of them is reported.
+totalDebt = ("NULLIF(COALESCE(" + column("CommercialPaper") + ", 0) + COALESCE(" +
+             column("LongTermDebtCurrent") + ", 0) + COALESCE(" + column("LongTermDebtNoncurrent") +
+             ", 0), 0)")
+
+# The columns of cik_ratios after cik, with their SQL types and the expression computing
+# each from a cik_financials row
+CIKRatiosColumns = [
+    ("return_on_equity", "numeric", ratio(column("NetIncomeLoss"), column("StockholdersEquity"))),
+    ("current_ratio", "numeric", ratio(column("AssetsCurrent"), column("LiabilitiesCurrent"))),
+    ("debt_to_equity", "numeric", ratio(totalDebt, column("StockholdersEquity"))),
+    ("gross_margin", "numeric", ratio(column("GrossProfit"), column("SalesRevenueNet"))),
+    ("free_cash_flow", "bigint", quoteColumn("NetCashProvidedByUsedInOperatingActivitiesContinuingOperations") +
+                                 " - " + quoteColumn("PaymentsToAcquirePropertyPlantAndEquipment")),
+]
+
+CIKRatiosColumnNames = [name for name, sqlType, expression in CIKRatiosColumns]
+
+
+def updateRatiosSQL(allCIKs=False):
+    columnList = ", ".join(["cik"] + CIKRatiosColumnNames)
+    expressionList = ", ".join(expression for name, sqlType, expression in CIKRatiosColumns)
+    updateList = ", ".join(name + " = EXCLUDED." + name for name in CIKRatiosColumnNames)
+    return ("INSERT INTO cik_ratios (" + columnList + ") " +
+            "SELECT cik, " + expressionList + " FROM cik_financials " +
+            ("" if allCIKs else "WHERE cik = ANY(%s) ") +
+            "ORDER BY cik " +
+            "ON CONFLICT (cik) DO UPDATE SET " + updateList)
+
+
+def updateRatios(cur, CIKs):
+    """Recompute the ratios of the given companies from their cik_financials rows, inside
+    the cursor's current transaction."""
+    if CIKs:
+        cur.execute(updateRatiosSQL(), (list(CIKs),))
+
+
+def rebuildRatios(cur):
+    """Recompute the ratios of every company."""
+    cur.execute(updateRatiosSQL(allCIKs=True))
@@ -0,0 +1,117 @@
+#
+# On-disk cache of the facts extracted from filings.
+#
+# Entries are pickled with the highest protocol, which stores the FactStore's typed arrays
+# as raw bytes, and are keyed by the SHA-256 of the filing and the parser version. The
+# cache is bounded in size: once it grows past its limit the least recently used entries
+# are evicted, using file modification times, which get() refreshes, as the usage clock.
+#
+import os
+import pickle
+import tempfile
+
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+
+# Entries are written to a temporary name first, then renamed into place, so readers in
+# other processes never see a partial entry
+ENTRY_SUFFIX = ".pickle"
+
+
+class ParseCache:
+
+    def __init__(self, directory, maxBytes=None):
+        self.directory = directory
+        self.maxBytes = maxBytes or DEFAULT_CACHE_SIZE
+        # Bytes written since the cache's size was last checked. Scanning the whole cache on
+        # every write would be wasteful, so it is only done once this much has been added.
+        self.bytesSinceCheck = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def entryPath(self, digest, version):
+        # Fan out over subdirectories so no single directory gets huge
+        return os.path.join(self.directory, digest[:2], digest + "-v" + str(version) + ENTRY_SUFFIX)
+
+    def get(self, digest, version):
+        """Return the cached object for a file digest and parser version, or None."""
+        path = self.entryPath(digest, version)
+        try:
+            with open(path, "rb") as f:
+                extracted = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+            print("Discarding unreadable cache entry " + path + ": " + repr(e))
+            self.remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted by another process in the meantime; the data we read is still good
+            pass
+        return extracted
+
+    def put(self, digest, version, extracted):
+        path = self.entryPath(digest, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(extracted, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(tmpPath, path)
+        except BaseException:
+            self.remove(tmpPath)
+            raise
+
+        self.bytesSinceCheck += size
+        if self.bytesSinceCheck > self.maxBytes // 16:
+            self.evict()
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits within its limit."""
+        self.bytesSinceCheck = 0
+
+        entries = []
+        totalBytes = 0
+        for dirPath, dirNames, fileNames in os.walk(self.directory):
+            for name in fileNames:
+                if not name.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(dirPath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                totalBytes += stat.st_size
+
+        if totalBytes <= self.maxBytes:
+            return
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if totalBytes <= self.maxBytes:
+                break
+            self.remove(path)
+            totalBytes -= size
+
+
+# One cache object per directory per process, so the worker processes in a batch run keep
+# their write counts between filings
+parseCaches = {}
+
+
+def getParseCache(directory, maxBytes=None):
+    cache = parseCaches.get(directory)
+    if cache is None:
+        cache = ParseCache(directory, maxBytes)
+        parseCaches[directory] = cache
+    return cache
@@ -0,0 +1,115 @@
+#
+# Per-filing parser metrics, and writers for them.
+#
+# A ParseMetrics record is filled in by XBRLParser as it works through a filing. The
+# records can be written as JSON lines, one per filing as each one finishes, or as a
+# Prometheus text exposition file suitable for node_exporter's textfile collector.
+#
+import json
+import os
+import tempfile
+
+
+class ParseMetrics:
+    """Counters and phase timings for one filing. Times are in seconds."""
+    __slots__ = ("filename", "CIK", "bytesRead", "elements", "facts", "contexts", "periods",
+                 "cacheHit", "cacheSeconds", "parseSeconds", "contextSeconds", "selectSeconds",
+                 "totalSeconds", "error")
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.CIK = 0
+        self.bytesRead = 0
+        # Top level elements (facts, contexts, units...) handed to the parser by the engine
+        self.elements = 0
+        # Numeric facts kept in the fact store, and contexts with a usable period
+        self.facts = 0
+        self.contexts = 0
+        self.periods = 0
+        self.cacheHit = False
+        self.cacheSeconds = 0.0
+        # Time spent in the engine's iterparse loop and fact handling, excluding the time
+        # spent resolving contexts, which is counted separately
+        self.parseSeconds = 0.0
+        self.contextSeconds = 0.0
+        self.selectSeconds = 0.0
+        self.totalSeconds = 0.0
+        self.error = None
+
+    def asDict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class JSONLinesMetricsWriter:
+    """Append one JSON object per filing to a file, flushing as it goes so the file can be
+    tailed during a long run."""
+
+    def __init__(self, filename):
+        self.f = open(filename, "a")
+
+    def write(self, metrics):
+        self.f.write(json.dumps(metrics.asDict()) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+def escapeLabel(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class PrometheusMetricsWriter:
+    """Collect metrics for every filing and write them out as a Prometheus text file when
+    closed. The file is replaced atomically, so a scraper never sees half of it."""
+
+    # (metric name, ParseMetrics attribute, help text)
+    filingMetrics = [
+        ("vidb_parse_bytes", "bytesRead", "Size of the instance document in bytes."),
+        ("vidb_parse_elements", "elements", "Top level XML elements seen."),
+        ("vidb_parse_facts", "facts", "Numeric facts kept."),
+        ("vidb_parse_contexts", "contexts", "Contexts kept."),
+        ("vidb_parse_cache_seconds", "cacheSeconds", "Time spent hashing and reading or writing the parse cache."),
+        ("vidb_parse_iterparse_seconds", "parseSeconds", "Time spent in iterparse and fact handling."),
+        ("vidb_parse_context_seconds", "contextSeconds", "Time spent resolving contexts."),
+        ("vidb_parse_select_seconds", "selectSeconds", "Time spent selecting statement periods."),
+        ("vidb_parse_total_seconds", "totalSeconds", "Total time spent on the filing."),
+    ]
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.records = []
+
+    def write(self, metrics):
+        self.records.append(metrics)
+
+    def close(self):
+        lines = []
+        for name, attribute, helpText in self.filingMetrics:
+            lines.append("# HELP " + name + " " + helpText)
+            lines.append("# TYPE " + name + " gauge")
+            for metrics in self.records:
+                labels = 'file="' + escapeLabel(metrics.filename) + '",cik="' + str(metrics.CIK) + '"'
+                lines.append(name + "{" + labels + "} " + repr(getattr(metrics, attribute)))
+
+        failures = sum(1 for metrics in self.records if metrics.error is not None)
+        lines.append("# HELP vidb_parse_filings_total Filings processed in the run.")
+        lines.append("# TYPE vidb_parse_filings_total counter")
+        lines.append("vidb_parse_filings_total " + str(len(self.records)))
+        lines.append("# HELP vidb_parse_failures_total Filings that failed to parse in the run.")
+        lines.append("# TYPE vidb_parse_failures_total counter")
+        lines.append("vidb_parse_failures_total " + str(failures))
+
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        fd, tmpPath = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmpPath, self.filename)
+
+
+def openMetricsWriter(filename):
+    """Pick the writer from the file name: .prom files get the Prometheus text format,
+    anything else gets JSON lines."""
+    if filename.endswith(".prom"):
+        return PrometheusMetricsWriter(filename)
+    return JSONLinesMetricsWriter(filename)
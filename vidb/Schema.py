@@ -0,0 +1,201 @@
+#
+# The database schema for the VI web site: cik_financials, the cik_facts time series with
+# its cik_statements view, ticker_cik and cik_ratios.
+#
+# The DDL is put together as one script and sent in a single execute, so creating or
+# migrating the schema costs one round trip (two when migrating cik_financials, which
+# first reads the table's columns). Everything is created only if missing, so it is safe
+# to re-run.
+#
+import datetime
+
+from vidb import LoadVIdbTable_CIKFacts as factLoader
+from vidb import LoadVIdbTable_CIKFinancials as loader
+from vidb import LoadVIdbTable_CIKRatios as ratioLoader
+
+schemaTables = ("cik_financials", "cik_facts", "cik_ratios")
+
+# Comments on the cik_financials columns marking where each statement starts and ends
+CIKFinancialsComments = [
+    ("CommonStockDividendsPerShareDeclared", "last column of income statement"),
+    ("OtherComprehensiveIncomeLossNetOfTax", "first column of balance sheet"),
+    ("AvailableForSaleSecuritiesCurrent", "Short-term marketable securities"),
+    ("AccountsReceivableNetCurrent", "Accounts receivable"),
+    ("InventoryNet", "Inventory"),
+    ("AssetsCurrent", "Total current assets"),
+    ("AvailableForSaleSecuritiesNoncurrent", "Long-term marketable securities"),
+    ("PropertyPlantAndEquipmentNet", "Property, plant and equipment, net"),
+    ("OtherAssetsNoncurrent", "Other Assets"),
+    ("Assets", "Total assets"),
+    ("LongTermDebtCurrent", "Current portion of long-term debt"),
+    ("Liabilities", "Total liabilities"),
+    ("LiabilitiesAndStockholdersEquity", "Total liabilities and shareholders’ equity--last entry in balance sheet"),
+    ("DepreciationAmortizationAndAccretionNet", "first column of cash flow statement"),
+    ("IncreaseDecreaseInAccountsReceivable", "Accounts receivable, net"),
+    ("IncreaseDecreaseInOtherOperatingAssets", "Other current and non-current assets"),
+    ("NetCashProvidedByUsedInOperatingActivitiesContinuingOperations", "Last entry for operating activities"),
+    ("PaymentsToAcquireAvailableForSaleSecurities", "First entry for investing activities"),
+    ("NetCashProvidedByUsedInInvestingActivitiesContinuingOperations", "Last entry for investing activities"),
+    ("ProceedsFromIssuanceOfCommonStock", "First entry for financing activities"),
+]
+
+# Shown in AAPL statement, but not GAAP:
+#   <aapl:IncreaseDecreaseInNonTradeReceivables contextRef="eol_PE2035----1510-K0012_STD_364_20150926_0" unitRef="iso4217_USD" decimals="-6" id="id_5290686_88BDB078-95B3-493E-8A8D-33F52EB05AD7_1_10">3735000000</aapl:IncreaseDecreaseInNonTradeReceivables>
+#   <aapl:PaymentsOfDividendsAndDividendEquivalentsOnCommonStockAndRestrictedStockUnits contextRef="eol_PE2035----1510-K0012_STD_364_20150926_0" unitRef="iso4217_USD" decimals="-6" id="id_5290686_88BDB078-95B3-493E-8A8D-33F52EB05AD7_1_29">11561000000</aapl:PaymentsOfDividendsAndDividendEquivalentsOnCommonStockAndRestrictedStockUnits>
+
+
+def headerStatements():
+    """The pg_dump style header the schema has always been created with."""
+    return [
+        "SET statement_timeout = 0",
+        "SET client_encoding = 'UTF8'",
+        "SET standard_conforming_strings = off",
+        "SET check_function_bodies = false",
+        "SET client_min_messages = warning",
+        "SET escape_string_warning = off",
+        #
+        # Name: plpgsql; Type: PROCEDURAL LANGUAGE; Schema: -; Owner: postgres
+        #
+        "CREATE OR REPLACE PROCEDURAL LANGUAGE plpgsql",
+        "ALTER PROCEDURAL LANGUAGE plpgsql OWNER TO postgres",
+        "SET search_path = public, pg_catalog",
+        "SET default_tablespace = ''",
+        "SET default_with_oids = false",
+    ]
+
+
+def financialsStatements(existingColumns=None):
+    """The statements creating cik_financials. Given the table's existing {column: type},
+    also those migrating it in place: columns missing from it are added, and columns
+    whose type has changed are altered. The table is never dropped."""
+    quote = loader.quoteColumn
+    columns = loader.CIKFinancialsColumns + [loader.PeriodEndColumn]
+    columnDefs = ", ".join(quote(name) + " " + sqlType for name, sqlType in columns)
+    statements = [
+        #
+        # Name: cik_financials; Type: TABLE; Schema: public; Owner: postgres
+        #
+        "CREATE TABLE IF NOT EXISTS cik_financials (" + columnDefs + ", " +
+        "CONSTRAINT cik_financials_pkey PRIMARY KEY (cik))",
+        "ALTER TABLE public.cik_financials OWNER TO postgres",
+    ]
+
+    if existingColumns:
+        for name, sqlType in columns:
+            if name not in existingColumns:
+                print("Adding column " + name)
+                statements.append("ALTER TABLE cik_financials ADD COLUMN " + quote(name) + " " + sqlType)
+            elif existingColumns[name] != sqlType:
+                print("Changing type of column " + name + " from " + existingColumns[name] + " to " + sqlType)
+                statements.append("ALTER TABLE cik_financials ALTER COLUMN " + quote(name) +
+                                  " TYPE " + sqlType + " USING " + quote(name) + "::" + sqlType)
+
+    for name, comment in CIKFinancialsComments:
+        statements.append("COMMENT ON COLUMN cik_financials." + quote(name) + " IS '" + comment + "'")
+
+    # TODO: what good is this? Why does pgdump emit it?
+    statements += [
+        "CREATE SEQUENCE IF NOT EXISTS cik_financials_cik_seq START WITH 1 INCREMENT BY 1 NO MINVALUE NO MAXVALUE CACHE 1",
+        "ALTER TABLE public.cik_financials_cik_seq OWNER TO postgres",
+        "ALTER SEQUENCE cik_financials_cik_seq OWNED BY cik_financials.cik",
+    ]
+    return statements
+
+
+def factsStatements():
+    """The statements creating cik_facts, its partitions, the cik_statements view and
+    ticker_cik."""
+    periodTypes = ", ".join("'" + periodType + "'" for periodType in factLoader.periodTypes)
+    return [
+        #
+        # Name: cik_facts; Type: TABLE; Schema: public; Owner: postgres
+        #
+        # One row per company, statement period and concept. Values are numeric, so nothing
+        # overflows and per-share amounts keep their precision. The table is partitioned by
+        # the year of period_end, which keeps each year's facts, and their indexes, together.
+        #
+        # The primary key covers the "latest statement" lookup for a company, and the history
+        # index covers a concept's history; both INCLUDE the value so they are index-only scans.
+        #
+        "CREATE TABLE IF NOT EXISTS cik_facts (" +
+        "cik integer NOT NULL, " +
+        "period_end date NOT NULL, " +
+        "period_type text NOT NULL CHECK (period_type IN (" + periodTypes + ")), " +
+        "concept text NOT NULL, " +
+        "period_start date, " +
+        "value numeric NOT NULL, " +
+        "CONSTRAINT cik_facts_pkey PRIMARY KEY (cik, period_end, period_type, concept) INCLUDE (value)" +
+        ") PARTITION BY RANGE (period_end)",
+        "CREATE INDEX IF NOT EXISTS cik_facts_history ON cik_facts " +
+        "(cik, concept, period_type, period_end DESC) INCLUDE (value)",
+        "ALTER TABLE public.cik_facts OWNER TO postgres",
+    ] + factLoader.partitionStatements(range(factLoader.FIRST_PARTITION_YEAR, datetime.date.today().year + 2)) + [
+        #
+        # Name: cik_statements; Type: MATERIALIZED VIEW; Schema: public; Owner: postgres
+        #
+        # cik_facts pivoted back into the cik_financials columns, one row per company and
+        # annual or quarterly period. The unique index serves the site's latest statement and
+        # history queries, and lets the view be refreshed concurrently after each load.
+        #
+        "CREATE MATERIALIZED VIEW IF NOT EXISTS cik_statements AS " + factLoader.statementsViewSQL(),
+        "CREATE UNIQUE INDEX IF NOT EXISTS cik_statements_key ON cik_statements " +
+        "(cik, period_type, period_end DESC)",
+        "ALTER MATERIALIZED VIEW public.cik_statements OWNER TO postgres",
+        #
+        # Name: ticker_cik; Type: TABLE; Schema: public; Owner: postgres
+        #
+        "CREATE TABLE IF NOT EXISTS ticker_cik (" +
+        "ticker character varying(8) NOT NULL, cik integer NOT NULL, " +
+        "CONSTRAINT ticker_cik_pkey PRIMARY KEY (ticker))",
+        "CREATE INDEX IF NOT EXISTS ticker_cik_cik ON ticker_cik (cik)",
+        "ALTER TABLE public.ticker_cik OWNER TO postgres",
+    ]
+
+
+def ratiosStatements():
+    """The statements creating cik_ratios and recomputing the ratios of every company,
+    which is also how a changed ratio definition is applied."""
+    columnDefs = ", ".join(name + " " + sqlType for name, sqlType, expression in ratioLoader.CIKRatiosColumns)
+    statements = [
+        #
+        # Name: cik_ratios; Type: TABLE; Schema: public; Owner: postgres
+        #
+        "CREATE TABLE IF NOT EXISTS cik_ratios (cik integer NOT NULL, " + columnDefs + ", " +
+        "CONSTRAINT cik_ratios_pkey PRIMARY KEY (cik))",
+        "ALTER TABLE public.cik_ratios OWNER TO postgres",
+    ]
+    # One index per ratio, so a screen on any of them is a range scan
+    for name in ratioLoader.CIKRatiosColumnNames:
+        statements.append("CREATE INDEX IF NOT EXISTS cik_ratios_" + name + " ON cik_ratios (" + name + ") INCLUDE (cik)")
+    statements.append(ratioLoader.updateRatiosSQL(allCIKs=True))
+    return statements
+
+
+def readColumns(cur, table):
+    cur.execute("SELECT column_name, data_type FROM information_schema.columns " +
+                "WHERE table_schema = 'public' AND table_name = %s", (table,))
+    return dict(cur.fetchall())
+
+
+def schemaScript(tables=schemaTables, existingColumns=None):
+    """The DDL for the given tables as one script. existingColumns are cik_financials'
+    current columns, to migrate it."""
+    statements = headerStatements()
+    if "cik_financials" in tables:
+        statements += financialsStatements(existingColumns)
+    if "cik_facts" in tables:
+        statements += factsStatements()
+    if "cik_ratios" in tables:
+        statements += ratiosStatements()
+    return ";\n".join(statements) + ";\n"
+
+
+def createSchema(conn, tables=schemaTables, migrate=False):
+    """Create the given tables in one transaction. With migrate, cik_financials is also
+    brought up to date with CIKFinancialsColumns if it already exists."""
+    with conn:
+        with conn.cursor() as cur:
+            existingColumns = None
+            if migrate and "cik_financials" in tables:
+                existingColumns = readColumns(cur, "cik_financials")
+            cur.execute(schemaScript(tables, existingColumns))
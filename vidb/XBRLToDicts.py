@@ -0,0 +1,1190 @@
+#!/usr/bin/env python
+#
+# Parse an XBRL file and store the interesting data to data structures.
+#
+# Todo: capture CashAndCashEquivalentsAtCarryingValue
+#
+import argparse
+import array
+import concurrent.futures
+import functools
+import glob
+import hashlib
+import io
+import logging
+import os
+import pickle
+import pprint
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import xml.etree.ElementTree as ET
+
+from vidb.FilingArchives import archiveKind, archivePath, isInstanceDocument, iterArchiveFilings
+from vidb.IngestManifest import fileDigest
+from vidb.LoadVIdbTable_CIKFinancials import CIKFinancialsColumnNames
+from vidb.ParseCache import getParseCache
+from vidb.ParseMetrics import ParseMetrics, openMetricsWriter
+
+try:
+    from lxml import etree as lxmlET
+except ImportError:
+    lxmlET = None
+
+gVerbose = False
+
+# Bump this whenever a change to extractFacts() changes what it extracts, so that stale
+# entries in the parse cache are not used
+PARSER_VERSION = 7
+
+# The US GAAP concepts kept by default: those with a column in cik_financials. Every other
+# fact, text blocks included, is skipped without its text ever being read.
+statementConcepts = frozenset(CIKFinancialsColumnNames[1:])
+
+# selectPeriods() ignores contexts with this many facts or fewer. With only the statement
+# concepts kept a context has far fewer facts, so the bar is lower, and a short concept
+# list lowers it further: a context needs more than a quarter of the list.
+ALL_CONCEPTS_MIN_FACTS = 15
+STATEMENT_CONCEPTS_MIN_FACTS = 5
+
+
+def minContextFacts(concepts):
+    """The number of facts a context must have more of for selectPeriods() to consider it,
+    given the concepts kept (None for all of them)."""
+    if concepts is None:
+        return ALL_CONCEPTS_MIN_FACTS
+    return min(STATEMENT_CONCEPTS_MIN_FACTS, len(concepts) // 4)
+
+
+class DateContext:
+    __slots__ = ("periodStart", "periodEnd")
+
+    def __init__(self, periodStart, periodEnd):
+        # Note that periodStart may be None if the context's date range is "instant"
+        self.periodStart = periodStart
+        self.periodEnd = periodEnd
+
+
+@functools.lru_cache(maxsize=4096)
+def parseDate(text):
+    """Parse an XBRL date. A filing's thousands of contexts share a few dozen dates, so
+    the parsed dates are memoized."""
+    return datetime.strptime(text, "%Y-%m-%d")
+
+
+def contextKey(periodStart, periodEnd, hasSegment):
+    """The ContextIndex key for a context: (period end, length in days or None for an
+    instant, whether it has dimensions)."""
+    durationDays = None if periodStart is None else (periodEnd - periodStart).days
+    return periodEnd, durationDays, hasSegment
+
+
+class Form10Data:
+    """This class holds the parsed data from a form 10 filing for one statement period.
+    FilingData merges the balance sheet data (InstantContextData) with the income and cash
+    flow data (DateRangeContextData); either may be None if the filing lacks it."""
+    __slots__ = ("periodStart", "periodEnd", "CIK", "FilingData", "isCurrent",
+                 "InstantContextData", "DateRangeContextData")
+
+    def __init__(self, periodStart, periodEnd, CIK):
+        self.periodStart = periodStart
+        self.periodEnd = periodEnd
+        self.CIK = CIK
+        self.FilingData = {}
+        # True for the period the filing is for, as opposed to a prior period comparative
+        self.isCurrent = False
+        self.InstantContextData = None
+        self.DateRangeContextData = None
+
+    def setData(self, data):
+        self.FilingData = data
+
+
+# Stored in FactStore.factDecimals for a decimals="INF" fact or one with no decimals attribute
+DECIMALS_INF = 2**31 - 1
+DECIMALS_NONE = -2**31
+
+INT64_MIN = -2**63
+INT64_MAX = 2**63 - 1
+
+
+class FactStore:
+    """Columnar store of the numeric facts in a filing.
+
+    Concept names, context IDs and unit IDs are interned to small integers, and each fact
+    is one entry in a set of parallel typed arrays. Values are parsed once, when the fact
+    is added: those that fit in an int64 go in factValue, anything else (fractional per
+    share amounts, mostly) is kept as a Decimal in decimalValues, keyed by fact index.
+    Non-numeric facts (text blocks and the like) have no unit and are not stored."""
+    __slots__ = ("concepts", "conceptIDs", "contexts", "contextIDs", "units", "unitIDs",
+                 "factConcept", "factContext", "factUnit", "factDecimals", "factValue",
+                 "decimalValues")
+
+    def __init__(self):
+        self.concepts = []
+        self.conceptIDs = {}
+        self.contexts = []
+        self.contextIDs = {}
+        self.units = []
+        self.unitIDs = {}
+
+        self.factConcept = array.array('i')
+        self.factContext = array.array('i')
+        self.factUnit = array.array('i')
+        self.factDecimals = array.array('i')
+        self.factValue = array.array('q')
+        self.decimalValues = {}
+
+    def __len__(self):
+        return len(self.factValue)
+
+    @staticmethod
+    def intern(name, names, nameIDs):
+        nameID = nameIDs.get(name)
+        if nameID is None:
+            nameID = len(names)
+            names.append(name)
+            nameIDs[name] = nameID
+        return nameID
+
+    def conceptID(self, concept):
+        return self.intern(concept, self.concepts, self.conceptIDs)
+
+    def contextID(self, contextRef):
+        return self.intern(contextRef, self.contexts, self.contextIDs)
+
+    def unitID(self, unitRef):
+        return self.intern(unitRef, self.units, self.unitIDs)
+
+    def addFact(self, concept, contextRef, unitRef, decimals, text):
+        """Parse and store one numeric fact. Returns False if the text is not a number."""
+        text = text.strip()
+        try:
+            value = int(text)
+            decimalValue = None
+            if value < INT64_MIN or value > INT64_MAX:
+                decimalValue = Decimal(value)
+                value = 0
+        except ValueError:
+            try:
+                decimalValue = Decimal(text)
+            except InvalidOperation:
+                return False
+            if not decimalValue.is_finite():
+                return False
+            value = 0
+
+        if decimals is None:
+            decimalsValue = DECIMALS_NONE
+        elif decimals == "INF":
+            decimalsValue = DECIMALS_INF
+        else:
+            decimalsValue = int(decimals)
+
+        if decimalValue is not None:
+            self.decimalValues[len(self.factValue)] = decimalValue
+        self.factConcept.append(self.conceptID(concept))
+        self.factContext.append(self.contextID(contextRef))
+        self.factUnit.append(self.unitID(unitRef))
+        self.factDecimals.append(decimalsValue)
+        self.factValue.append(value)
+        return True
+
+    def valueAt(self, factIndex):
+        """Return the value of a fact as an int, or a Decimal if it is not an integer."""
+        decimalValue = self.decimalValues.get(factIndex)
+        if decimalValue is not None:
+            return decimalValue
+        return self.factValue[factIndex]
+
+    def contextFactCounts(self):
+        """Return an array of the number of distinct concepts reported in each context,
+        indexed by context ID."""
+        seen = set(zip(self.factContext, self.factConcept))
+        counts = array.array('i', bytes(4 * len(self.contexts)))
+        for contextIndex, conceptIndex in seen:
+            counts[contextIndex] += 1
+        return counts
+
+    def contextsWithConcept(self, concept):
+        """Return the set of context IDs that have a fact for the given concept."""
+        conceptIndex = self.conceptIDs.get(concept)
+        if conceptIndex is None:
+            return set()
+        return {contextIndex for conceptIndex2, contextIndex in zip(self.factConcept, self.factContext)
+                if conceptIndex2 == conceptIndex}
+
+    def factsByContext(self, contextIndices):
+        """Return a dictionary of context ID to factsForContext() for several contexts,
+        in one pass over the facts."""
+        concepts = self.concepts
+        contextData = {contextIndex: {} for contextIndex in contextIndices}
+        for i, contextIndex in enumerate(self.factContext):
+            dataDict = contextData.get(contextIndex)
+            if dataDict is not None:
+                dataDict[concepts[self.factConcept[i]]] = self.valueAt(i)
+        return contextData
+
+    def factsForContext(self, contextIndex):
+        """Return a dictionary of concept name to value for every fact in a context."""
+        concepts = self.concepts
+        return {concepts[self.factConcept[i]]: self.valueAt(i)
+                for i, c in enumerate(self.factContext) if c == contextIndex}
+
+
+log = logging.getLogger("xbrl")
+
+
+def verbose(message, *args):
+    """Log a debugging message. The message is only formatted when verbose output is on,
+    so pass values as arguments instead of building the string: verbose("term %s", term)."""
+    if gVerbose:
+        log.debug(message, *args)
+
+
+def setVerbose(enabled):
+    global gVerbose
+    gVerbose = enabled
+    if enabled:
+        logging.basicConfig(format="%(message)s")
+        log.setLevel(logging.DEBUG)
+
+
+# The XBRL instance namespace is fixed by the specification, unlike the us-gaap and dei
+# taxonomy namespaces which change with every taxonomy release.
+XBRLIns = "http://www.xbrl.org/2003/instance"
+
+contextTag = "{" + XBRLIns + "}context"
+entityTag = "{" + XBRLIns + "}entity"
+identifierTag = "{" + XBRLIns + "}identifier"
+periodTag = "{" + XBRLIns + "}period"
+startDateTag = "{" + XBRLIns + "}startDate"
+endDateTag = "{" + XBRLIns + "}endDate"
+instantTag = "{" + XBRLIns + "}instant"
+segmentTag = "{" + XBRLIns + "}segment"
+scenarioTag = "{" + XBRLIns + "}scenario"
+
+
+def addNamespace(namespaceDict, prefix, uri):
+    if prefix in namespaceDict and namespaceDict[prefix] != uri:
+        # NOTE: It is perfectly valid to have the same prefix refer
+        #     to different URI namespaces in different parts of the
+        #     document. This exception serves as a reminder that this
+        #     solution is not robust.    Use at your own peril.
+        # raise KeyError("Duplicate prefix with different URI found.")
+        print("Found definition for " + prefix + " when it's already defined as " + namespaceDict[prefix])
+
+    if len(prefix) > 0:
+        namespaceDict[prefix] = uri
+
+
+class ElementTreeEngine:
+    """Parser engine built on the standard library's ElementTree."""
+    name = "etree"
+
+    def iterTopLevel(self, source, namespaceDict, wantedTags):
+        """Yield the top level elements of the document (facts, contexts, units and so on)
+        as their end tags are parsed, filling in namespaceDict from the namespace
+        declarations as they are seen. wantedTags is called with namespaceDict once the
+        root element has started and returns the tags the caller will dispatch on. This
+        engine has no way to filter on them, so it yields every top level element.
+
+        Each element is cleared and detached from the root once the caller is done with it,
+        so the tree never grows beyond the element currently being parsed."""
+        XBRLroot = None
+
+        # Nesting depth of the current element; the root is at depth 1, facts and contexts at 2
+        depth = 0
+
+        for event, elem in ET.iterparse(source, ("start-ns", "start", "end")):
+            if event == "start":
+                depth += 1
+                if XBRLroot is None:
+                    XBRLroot = elem
+                    wantedTags(namespaceDict)
+            elif event == "end":
+                if depth == 2:
+                    yield elem
+                    elem.clear()
+                    XBRLroot.clear()
+                depth -= 1
+            else:
+                addNamespace(namespaceDict, elem[0], elem[1])
+
+
+class ReplayReader:
+    """Wraps a binary file object so that its first block can be looked at and then read
+    again as part of the whole, without seeking."""
+
+    def __init__(self, f, headSize=65536):
+        self.f = f
+        self.head = f.read(headSize)
+        self.pos = 0
+
+    def read(self, size=-1):
+        if self.pos >= len(self.head):
+            return self.f.read(size)
+        if size is None or size < 0:
+            data = self.head[self.pos:] + self.f.read()
+        else:
+            data = self.head[self.pos:self.pos + size]
+        self.pos += len(data)
+        return data
+
+
+class LxmlEngine:
+    """Parser engine built on lxml, which filters elements by tag in C so only the
+    elements the parser dispatches on ever reach Python."""
+    name = "lxml"
+
+    def iterTopLevel(self, source, namespaceDict, wantedTags):
+        """Same contract as ElementTreeEngine.iterTopLevel(), except that only elements
+        matching wantedTags are yielded. A "{namespace}*" wildcard given along with tags
+        in the same namespace does not widen what is yielded: lxml only frees the elements
+        before one it hands over, so those it filtered out after the last match would
+        otherwise stay in the tree until the end of the document. It makes lxml hand over
+        the whole namespace, and the elements without a listed tag are freed here."""
+        # The taxonomy namespaces have to be known before the tag filter can be built, so
+        # read just far enough to see the root element's declarations. A file object may
+        # not be seekable, so its first block is kept and replayed for the real parse.
+        prescanSource = source
+        if not isinstance(source, str):
+            source = ReplayReader(source)
+            prescanSource = io.BytesIO(source.head)
+        try:
+            for event, value in lxmlET.iterparse(prescanSource, events=("start-ns", "start")):
+                if event == "start-ns":
+                    addNamespace(namespaceDict, value[0], value[1])
+                else:
+                    break
+        except lxmlET.XMLSyntaxError:
+            # The block ended before the root element did; the real parse will report any
+            # actual error
+            pass
+
+        tags = wantedTags(namespaceDict)
+        listedTags = frozenset(tag for tag in tags if not tag.endswith("}*"))
+        freedPrefixes = tuple(tag[:-1] for tag in tags
+                              if tag.endswith("}*") and any(listed.startswith(tag[:-1]) for listed in listedTags))
+
+        for event, elem in lxmlET.iterparse(source, events=("end",), tag=tags, huge_tree=True):
+            parent = elem.getparent()
+            if parent is None or parent.getparent() is not None:
+                # The root, or an element nested inside another one, such as a typed
+                # dimension member. Those are dealt with along with their top level element.
+                continue
+            tag = elem.tag
+            if tag in listedTags or not tag.startswith(freedPrefixes):
+                yield elem
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+parserEngines = {"etree": ElementTreeEngine}
+if lxmlET is not None:
+    parserEngines["lxml"] = LxmlEngine
+
+
+def getEngine(name=None):
+    """Return a parser engine by name. The default, "auto", is lxml when it is installed
+    and ElementTree otherwise."""
+    if name is None or name == "auto":
+        name = "lxml" if "lxml" in parserEngines else "etree"
+    if name not in parserEngines:
+        raise ValueError("Unknown or unavailable parser engine: " + name)
+    return parserEngines[name]()
+
+
+def parserCacheVersion(concepts, earlyExit):
+    """The version parse cache entries are stored under. What gets extracted depends on the
+    concepts kept and the early exit as well as on the parser, so they are part of it."""
+    if concepts is None:
+        conceptsKey = "all"
+    elif concepts == statementConcepts:
+        conceptsKey = "statement"
+    else:
+        conceptsKey = hashlib.sha256("\n".join(sorted(concepts)).encode("utf-8")).hexdigest()[:16]
+    return str(PARSER_VERSION) + "-" + conceptsKey + ("-early" if earlyExit else "")
+
+
+class XBRLParser:
+
+    def __init__(self, filename, engine=None, cache=None, name=None, size=None, digest=None,
+                 concepts=statementConcepts, earlyExit=False):
+        """filename may also be a binary file object, such as a member streamed out of a
+        filing archive. name is then used in messages and metrics, size is its length if
+        known, and digest is the cache key for it; without one it is not cached.
+
+        concepts is the set of US GAAP concepts to keep, or None for all of them. With
+        earlyExit the document is only read until the DEI header and a current period fact
+        for every one of the concepts have been seen; concepts are either instants or date
+        ranges, so the current period is then complete. Comparative periods may not be.
+        Few filers report every cik_financials column, so it mostly pays off with a
+        short list of concepts that the filings are known to have."""
+        self.inputFilename = filename
+        self.engine = getEngine(engine)
+        self.cache = cache
+        self.digest = digest
+        self.concepts = concepts
+        self.earlyExit = earlyExit and concepts is not None
+        self.minFacts = minContextFacts(concepts)
+        self.cacheVersion = parserCacheVersion(concepts, self.earlyExit)
+        self.metrics = ParseMetrics(name or filename)
+        if size is not None:
+            self.metrics.bytesRead = size
+        self.CIK = 0
+        self.DEIDict = {}
+        self.periods = []
+
+
+    def extractNamespace(self, key, namespaceDict):
+        nsValue = namespaceDict.get(key)
+        if nsValue == None:
+            print("Missing " + key + " namespace")
+        return nsValue
+
+
+    toDateStr = lambda self,d : d.strftime("%Y-%m-%d")
+
+
+    def wantedTags(self, namespaceDict):
+        """Called by the engine once the document's namespaces are known. Works out the
+        taxonomy namespaces and builds the dispatch table for top level elements."""
+        print("Namespaces:")
+        pp = pprint.PrettyPrinter(indent = 4)
+        pp.pprint(namespaceDict)
+
+        # Generally Accepted Accounting Practices
+        self.usGAAPns = self.extractNamespace('us-gaap', namespaceDict)
+
+        # Document and Entity Information
+        self.DEIns = self.extractNamespace('dei', namespaceDict)
+
+        # Top level elements are dispatched on their full tag first, to a (handler, local
+        # name) pair, then on their namespace
+        self.tagHandlers = {contextTag: (self.handleContext, None)}
+        self.namespaceHandlers = {}
+        tags = [contextTag]
+        if self.usGAAPns and self.concepts is not None:
+            # Only the wanted concepts get a handler, so the rest are passed over without
+            # their text being touched, and lxml does not even hand them to Python
+            for concept in sorted(self.concepts):
+                tag = "{" + self.usGAAPns + "}" + concept
+                self.tagHandlers[tag] = (self.handleGAAPFact, concept)
+                tags.append(tag)
+        elif self.usGAAPns:
+            self.namespaceHandlers[self.usGAAPns] = self.handleGAAPFact
+        if self.usGAAPns:
+            # Along with the wanted concepts, the wildcard only lets the engine free the
+            # rest, text blocks included, as they go by
+            tags.append("{" + self.usGAAPns + "}*")
+        if self.DEIns:
+            self.namespaceHandlers[self.DEIns] = self.handleDEIFact
+            tags.append("{" + self.DEIns + "}*")
+        return tags
+
+
+    def handleGAAPFact(self, elem, GAAPterm):
+        unitRef = elem.get('unitRef')
+        if unitRef is None:
+            # Only numeric facts carry a unit. The rest are text, which we have no use for.
+            verbose("%s is not numeric", GAAPterm)
+            return
+        GAAPtext = elem.text
+        if GAAPtext != None:
+            verbose("GAAP term %s %s", GAAPterm, GAAPtext)
+            contextRef = elem.get('contextRef')
+            if not self.facts.addFact(GAAPterm, contextRef, unitRef, elem.get('decimals'), GAAPtext):
+                verbose("%s value is not a number", GAAPterm)
+            elif self.earlyExit and contextRef in self.currentContexts:
+                self.missingConcepts.discard(GAAPterm)
+        else:
+            verbose("%s has no text", GAAPterm)
+
+
+    def handleDEIFact(self, elem, DEIterm):
+        DEItext = elem.text
+        if DEItext != None:
+            self.DEIDict[DEIterm] = DEItext
+            if DEIterm == "EntityCentralIndexKey":
+                self.CIK = int(DEItext)
+                verbose("Found central index key %s converted to int %d", DEItext, self.CIK)
+            elif DEIterm == "DocumentPeriodEndDate":
+                self.EndDate = parseDate(DEItext)
+                print("Found document period end date " + self.toDateStr(self.EndDate))
+            else:
+                verbose("DEI term %s %.100s", DEIterm, DEItext)
+            if self.earlyExit and not self.headerRead and self.headerComplete():
+                self.findCurrentContexts()
+        else:
+            print(DEIterm + " has no text")
+
+
+    def handleContext(self, elem, localName):
+        startTime = time.perf_counter()
+        contextID = elem.get('id')
+        verbose("Found context %s", contextID)
+        startDate = None
+        endDate = None
+        contextCIK = None
+        hasSegment = False
+
+        entity = elem.find(entityTag)
+        if entity is not None:
+            identifier = entity.find(identifierTag)
+            if identifier is not None:
+                contextCIK = int(identifier.text)
+                verbose("\tFound CIK %d", contextCIK)
+            hasSegment = entity.find(segmentTag) is not None
+        # Dimensions may be given in a scenario instead of a segment
+        hasSegment = hasSegment or elem.find(scenarioTag) is not None
+
+        period = elem.find(periodTag)
+        if period is not None:
+            startDateString = period.findtext(startDateTag)
+            endDateString = period.findtext(endDateTag)
+            instantDateString = period.findtext(instantTag)
+            if startDateString and endDateString:
+                startDate = parseDate(startDateString)
+                endDate = parseDate(endDateString)
+            elif instantDateString:
+                # Filing data for the balance sheet all use an "instant" context with
+                # the text containing the dei:DocumentPeriodEndDate
+                endDate = parseDate(instantDateString)
+                verbose("\tFound instant string %s for context %s", instantDateString, contextID)
+                if contextID == "eol_PE2035----1510-K0012_STD_0_20150926_0":
+                    print("This should be the balance sheet context")
+
+        if endDate is None or (self.CIK and contextCIK != self.CIK):
+            verbose("Skipping totes bogus context")
+        else:
+            verbose("Adding context for period %.10s to %.10s", startDate, endDate)
+            dateContext = DateContext(startDate, endDate)
+            if hasSegment:
+                # Segment and other dimensional breakdowns are kept apart from the
+                # consolidated contexts the statements are taken from
+                self.DimensionalContextDict[contextID] = dateContext
+            else:
+                self.DateContextDict[contextID] = dateContext
+                if self.headerRead and self.isCurrentContext(startDate, endDate):
+                    self.currentContexts.add(contextID)
+            key = contextKey(startDate, endDate, hasSegment)
+            self.ContextIndex.setdefault(key, []).append(contextID)
+            if not self.CIK:
+                # The DEI header has not been read yet, so whose context this is can only
+                # be checked at the end
+                self.unverifiedContexts[contextID] = (contextCIK, key)
+
+        self.metrics.contextSeconds += time.perf_counter() - startTime
+
+
+    def dropOtherEntityContexts(self):
+        """Drop the contexts read before the DEI header that are not for the filer."""
+        for contextID, (contextCIK, key) in self.unverifiedContexts.items():
+            if contextCIK == self.CIK:
+                continue
+            verbose("Dropping context %s for CIK %s", contextID, contextCIK)
+            self.DateContextDict.pop(contextID, None)
+            self.DimensionalContextDict.pop(contextID, None)
+            self.currentContexts.discard(contextID)
+            self.ContextIndex[key].remove(contextID)
+            if not self.ContextIndex[key]:
+                del self.ContextIndex[key]
+
+
+    def isCurrentContext(self, startDate, endDate):
+        """Whether a context covers the filing's current statement period, as far as the
+        DEI header read so far can tell."""
+        if self.EndDate is None or endDate != self.EndDate:
+            return False
+        if startDate is None:
+            return True
+        periodMin, periodMax = statementPeriodDays.get(self.DEIDict.get('DocumentType'), (0, 0))
+        return periodMin <= (endDate - startDate).days <= periodMax
+
+
+    def headerComplete(self):
+        return self.CIK and self.EndDate is not None and 'DocumentType' in self.DEIDict
+
+
+    def findCurrentContexts(self):
+        """Called for the early exit once the DEI header is complete. Picks out the current
+        period's contexts among those already read and checks off the concepts of the facts
+        already seen in them; contexts read from here on are checked as they come."""
+        self.headerRead = True
+        for contextID, dateContext in self.DateContextDict.items():
+            contextCIK = self.unverifiedContexts.get(contextID, (self.CIK,))[0]
+            if contextCIK == self.CIK and self.isCurrentContext(dateContext.periodStart, dateContext.periodEnd):
+                self.currentContexts.add(contextID)
+        if self.currentContexts and len(self.facts):
+            facts = self.facts
+            for conceptIndex, contextIndex in zip(facts.factConcept, facts.factContext):
+                if facts.contexts[contextIndex] in self.currentContexts:
+                    self.missingConcepts.discard(facts.concepts[conceptIndex])
+
+
+    def foundCurrentPeriod(self):
+        """Whether every concept kept has a fact in a current period context."""
+        return self.headerRead and not self.missingConcepts
+
+
+    def extractFacts(self):
+        """Stream the document once, collecting its numeric facts, its contexts and its
+        DEI header, and return them as an ExtractedFiling."""
+        self.CIK = 0
+
+        # facts holds every numeric US GAAP fact in the filing, along with its context
+        self.facts = FactStore()
+
+        # DateContextDict should have keys of type context ID and values of type DateContext.
+        # It holds the consolidated contexts; those with dimensions go in DimensionalContextDict.
+        self.DateContextDict = {}
+        self.DimensionalContextDict = {}
+
+        # ContextIndex maps contextKey() tuples to lists of context IDs, so the contexts for
+        # a period can be looked up directly
+        self.ContextIndex = {}
+
+        # Contexts read before the filer's CIK was known, as context ID to (CIK, index key)
+        self.unverifiedContexts = {}
+
+        # DEIDict should have keys of type string that are the tag names and values of type string that are the text of the tag.
+        self.DEIDict = {}
+
+        # The end date is the DEI namespace end date. Use this to filter for current period data
+        self.EndDate = None
+
+        # namespaceDict should have keys of type string that are namespace names and values
+        # of type string that are the URI's for the corresponding name
+        namespaceDict = {}
+
+        self.tagHandlers = {}
+        self.namespaceHandlers = {}
+
+        # For the early exit: whether the DEI header is complete, the IDs of the current
+        # period's consolidated contexts, and the concepts not yet seen in one of them
+        self.headerRead = False
+        self.currentContexts = set()
+        self.missingConcepts = set(self.concepts or ())
+
+        metrics = self.metrics
+        startTime = time.perf_counter()
+        elements = 0
+
+        for elem in self.engine.iterTopLevel(self.inputFilename, namespaceDict, self.wantedTags):
+            elements += 1
+            tag = elem.tag
+            entry = self.tagHandlers.get(tag)
+            if entry is not None:
+                entry[0](elem, entry[1])
+                if self.earlyExit and self.foundCurrentPeriod():
+                    verbose("Current period found after %d elements", elements)
+                    break
+                continue
+
+            # Tags look like "{namespace URI}localName"
+            ns, sep, localName = tag[1:].partition('}')
+            handler = self.namespaceHandlers.get(ns)
+            if handler is not None:
+                handler(elem, localName)
+
+        self.dropOtherEntityContexts()
+
+        metrics.elements = elements
+        metrics.parseSeconds = time.perf_counter() - startTime - metrics.contextSeconds
+        return ExtractedFiling(self.CIK, self.DEIDict, self.DateContextDict, self.facts,
+                               self.DimensionalContextDict, self.ContextIndex, self.minFacts)
+
+
+    def extractFiling(self):
+        """First pass: return the ExtractedFiling holding every fact and context in the
+        filing.
+
+        With a cache, the extracted facts are looked up by the hash of the file's contents
+        and the document is only parsed if they are not there, so changes to the selection
+        can be rerun over a whole corpus without reparsing it."""
+        metrics = self.metrics
+        isFile = isinstance(self.inputFilename, str)
+        if isFile:
+            metrics.bytesRead = os.path.getsize(self.inputFilename)
+
+        if self.cache is None or (self.digest is None and not isFile):
+            extracted = self.extractFacts()
+        else:
+            startTime = time.perf_counter()
+            digest = self.digest or fileDigest(self.inputFilename)
+            extracted = self.cache.get(digest, self.cacheVersion)
+            metrics.cacheSeconds = time.perf_counter() - startTime
+            metrics.cacheHit = extracted is not None
+            if extracted is None:
+                extracted = self.extractFacts()
+                startTime = time.perf_counter()
+                self.cache.put(digest, self.cacheVersion, extracted)
+                metrics.cacheSeconds += time.perf_counter() - startTime
+
+        metrics.CIK = extracted.CIK
+        metrics.facts = len(extracted.facts)
+        metrics.contexts = len(extracted.DateContextDict) + len(extracted.DimensionalContextDict)
+
+        self.CIK = extracted.CIK
+        self.DEIDict = extracted.DEIDict
+        return extracted
+
+
+    def parseFiling(self):
+        """Parse the filing and return its (InstantContextData, DateRangeContextData) for the
+        current period. Use extractFiling() and selectPeriods() to get the comparative
+        periods as well."""
+        startTime = time.perf_counter()
+        extracted = self.extractFiling()
+
+        # For now, log the contents of the DEI dictionary
+        pp = pprint.PrettyPrinter(indent = 2)
+        print("DEI dictionary has:")
+        pp.pprint(extracted.DEIDict)
+
+        facts = extracted.facts
+        print("Fact store has " + str(len(facts)) + " facts in " + str(len(facts.contexts)) + " contexts")
+
+        print("Statement period end date " + str(extracted.DEIDict.get('DocumentPeriodEndDate')))
+        print("Statement type " + str(extracted.DEIDict.get('DocumentType')))
+
+        # The income and cash flow data use a date range, while the balance sheet
+        # data use the instant of the end date of the statement. Save the relevant
+        # dictionaries for each
+        DateRangeContextData = None
+        InstantContextData = None
+
+        selectTime = time.perf_counter()
+        periods = selectPeriods(extracted)
+        self.periods = periods
+        self.metrics.selectSeconds = time.perf_counter() - selectTime
+        self.metrics.periods = len(periods)
+
+        for period in periods:
+            if not period.isCurrent:
+                continue
+            DateRangeContextData = period.DateRangeContextData
+            InstantContextData = period.InstantContextData
+            if DateRangeContextData:
+                print("Most interesting date range context:")
+                pp.pprint(DateRangeContextData)
+            if InstantContextData:
+                print("\tMost instant data dictionary has " + str(len(InstantContextData)) + " entries")
+                pp.pprint(InstantContextData)
+
+        print('\nProcessing complete\n')
+
+        self.metrics.totalSeconds = time.perf_counter() - startTime
+        return InstantContextData, DateRangeContextData
+
+
+class ExtractedFiling:
+    """Everything the first pass over a filing keeps: the filer's CIK, the DEI header, the
+    date of each consolidated and dimensional context, an index of the contexts by period,
+    the numeric facts, and the minContextFacts() of the concepts they were extracted with."""
+    __slots__ = ("CIK", "DEIDict", "DateContextDict", "facts", "DimensionalContextDict", "ContextIndex",
+                 "minFacts")
+
+    def __init__(self, CIK, DEIDict, DateContextDict, facts, DimensionalContextDict=None, ContextIndex=None,
+                 minFacts=ALL_CONCEPTS_MIN_FACTS):
+        self.CIK = CIK
+        self.DEIDict = DEIDict
+        self.DateContextDict = DateContextDict
+        self.facts = facts
+        self.DimensionalContextDict = DimensionalContextDict or {}
+        self.ContextIndex = ContextIndex or {}
+        self.minFacts = minFacts
+
+    def contextsFor(self, periodEnd, durationDays=None, hasSegment=False):
+        """Return the IDs of the contexts ending on periodEnd that last durationDays days,
+        or are instants if it is None. Consolidated contexts by default."""
+        return self.ContextIndex.get((periodEnd, durationDays, hasSegment), ())
+
+
+# The length in days of the income statement period for each form type
+statementPeriodDays = {
+    '10-K': (360, 369),
+    '10-Q': (89, 96),
+}
+
+
+def selectPeriods(extracted, minFacts=None):
+    """Second pass: return a Form10Data for every statement period in an extracted filing,
+    latest first. That is the current period and the prior periods the filing reports for
+    comparison.
+
+    A period's income and cash flow data come from the date range context of the form's
+    statement length ending on that date, and its balance sheet data from the instant
+    context on that date holding CashAndCashEquivalentsAtCarryingValue. Only consolidated
+    contexts with more than minFacts facts (by default, the extracted filing's own) are
+    considered, and where several qualify for the same date the one with the most facts
+    wins. The candidates are found through the context index, so dimensional contexts,
+    however many there are, are never looked at."""
+    facts = extracted.facts
+    if minFacts is None:
+        minFacts = extracted.minFacts
+
+    docType = extracted.DEIDict.get('DocumentType')
+    if docType in statementPeriodDays:
+        periodMin, periodMax = statementPeriodDays[docType]
+    else:
+        print('What the what with document type ' + str(docType))
+        periodMin, periodMax = 0, 0
+    try:
+        docEndDate = parseDate(extracted.DEIDict.get('DocumentPeriodEndDate', '').strip())
+    except ValueError:
+        docEndDate = None
+
+    factCounts = facts.contextFactCounts()
+    cashContexts = facts.contextsWithConcept('CashAndCashEquivalentsAtCarryingValue')
+    interestingContexts = facts.contextsWithConcept('NetIncomeLoss') | cashContexts
+
+    # The best context for each period end date, as (fact count, context index, DateContext)
+    rangeByEnd = {}
+    instantByEnd = {}
+
+    # Consolidated contexts of the statement length, and instants
+    candidates = []
+    for (periodEnd, durationDays, hasSegment), contextIDs in extracted.ContextIndex.items():
+        if hasSegment:
+            continue
+        if durationDays is not None and (durationDays < periodMin or durationDays > periodMax):
+            continue
+        for contextID in contextIDs:
+            contextIndex = facts.contextIDs.get(contextID)
+            if contextIndex in interestingContexts:
+                candidates.append(contextIndex)
+
+    # Context IDs in the fact store are numbered in order of first appearance, so sorting
+    # keeps the contexts in document order
+    for contextIndex in sorted(candidates):
+        count = factCounts[contextIndex]
+        if count <= minFacts:
+            continue
+
+        dateContext = extracted.DateContextDict[facts.contexts[contextIndex]]
+        if dateContext.periodStart is not None:
+            byEnd = rangeByEnd
+        elif contextIndex in cashContexts:
+            byEnd = instantByEnd
+        else:
+            continue
+
+        best = byEnd.get(dateContext.periodEnd)
+        if best is None or count > best[0]:
+            byEnd[dateContext.periodEnd] = (count, contextIndex, dateContext)
+
+    selected = [entry[1] for entry in rangeByEnd.values()] + [entry[1] for entry in instantByEnd.values()]
+    contextData = facts.factsByContext(selected)
+
+    periods = []
+    for periodEnd in sorted(set(rangeByEnd) | set(instantByEnd), reverse=True):
+        rangeEntry = rangeByEnd.get(periodEnd)
+        instantEntry = instantByEnd.get(periodEnd)
+
+        period = Form10Data(rangeEntry[2].periodStart if rangeEntry else None, periodEnd, extracted.CIK)
+        period.isCurrent = periodEnd == docEndDate
+        period.DateRangeContextData = contextData[rangeEntry[1]] if rangeEntry else None
+        period.InstantContextData = contextData[instantEntry[1]] if instantEntry else None
+
+        filingData = {}
+        filingData.update(period.InstantContextData or {})
+        filingData.update(period.DateRangeContextData or {})
+        period.setData(filingData)
+
+        periods.append(period)
+
+    return periods
+
+
+# The period_type stored in cik_facts for the date range facts of each form type. Balance
+# sheet facts are 'instant' whatever the form.
+statementPeriodTypes = {
+    '10-K': 'annual',
+    '10-Q': 'quarter',
+}
+
+
+def statementPeriods(periods, docType):
+    """Flatten the Form10Data from selectPeriods() into plain (periodType, periodStart,
+    periodEnd, facts) tuples, one for the balance sheet and one for the date range
+    statements of each period, ready to be sent back from a worker and loaded into
+    cik_facts."""
+    rangeType = statementPeriodTypes.get(docType)
+    statements = []
+    for period in periods:
+        if period.InstantContextData:
+            statements.append(('instant', None, period.periodEnd, period.InstantContextData))
+        if period.DateRangeContextData and rangeType is not None:
+            statements.append((rangeType, period.periodStart, period.periodEnd, period.DateRangeContextData))
+    return statements
+
+
+def isFilingFile(filename):
+    return isInstanceDocument(filename) or archiveKind(filename) is not None
+
+
+def expandFilingPaths(paths, manifests=()):
+    """Turn a mix of file names, directories, glob patterns and manifest files (one
+    file name per line, relative to the manifest) into a list of instance documents and
+    filing archives."""
+    filenames = []
+
+    for manifest in manifests:
+        baseDir = os.path.dirname(manifest)
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    filenames.append(os.path.join(baseDir, line))
+
+    for path in paths:
+        if os.path.isdir(path):
+            for dirPath, dirNames, fileNames in os.walk(path):
+                dirNames.sort()
+                for name in sorted(fileNames):
+                    if isFilingFile(name):
+                        filenames.append(os.path.join(dirPath, name))
+        elif os.path.exists(path):
+            filenames.append(path)
+        else:
+            matches = sorted(glob.glob(path, recursive=True))
+            if not matches:
+                print("No filings match " + path, file=sys.stderr)
+            filenames.extend(expandFilingPaths([m for m in matches if os.path.isdir(m)]))
+            filenames.extend(m for m in matches if not os.path.isdir(m) and isFilingFile(m))
+
+    return filenames
+
+
+def parseFilingFile(filename, engine=None, cacheDir=None, cacheSize=None, concepts=statementConcepts, earlyExit=False):
+    """Parse one filing. This is the unit of work handed to the worker processes, so it
+    returns plain picklable data: (CIK, InstantContextData, DateRangeContextData)."""
+    cache = getParseCache(cacheDir, cacheSize) if cacheDir else None
+    xbrlParser = XBRLParser(filename, engine, cache, concepts=concepts, earlyExit=earlyExit)
+    balanceDict, incomeDict = xbrlParser.parseFiling()
+    return xbrlParser.CIK, balanceDict, incomeDict
+
+
+def parseFilingTask(name, source=None, engine=None, cacheDir=None, cacheSize=None, size=None, digest=None,
+                    concepts=statementConcepts, earlyExit=False):
+    """Like parseFilingFile(), but never raises, so the filing's metrics make it back from
+    the worker even when it fails. source is the file name, a file object, or the bytes of
+    an archive member; by default it is the name. Returns (result, metrics, error)."""
+    if source is None:
+        source = name
+    elif isinstance(source, bytes):
+        source = io.BytesIO(source)
+    cache = getParseCache(cacheDir, cacheSize) if cacheDir else None
+    xbrlParser = XBRLParser(source, engine, cache, name, size, digest, concepts, earlyExit)
+    try:
+        balanceDict, incomeDict = xbrlParser.parseFiling()
+    except Exception as e:
+        xbrlParser.metrics.error = repr(e)
+        try:
+            pickle.dumps(e)
+        except Exception:
+            # Some parser errors (lxml's, for one) cannot be sent back from a worker process
+            e = RuntimeError(repr(e))
+        return None, xbrlParser.metrics, e
+    statements = statementPeriods(xbrlParser.periods, xbrlParser.DEIDict.get('DocumentType'))
+    return (xbrlParser.CIK, balanceDict, incomeDict, statements), xbrlParser.metrics, None
+
+
+def iterFilingSources(filenames):
+    """Yield (name, source, size, digest) for each filing to parse. An instance document is
+    its own source; archives are opened and the instance documents in them streamed out.
+    An archive that cannot be read yields its name with the exception as the source."""
+    for filename in filenames:
+        if archiveKind(filename) is None:
+            yield filename, filename, None, None
+            continue
+        try:
+            yield from iterArchiveFilings(filename)
+        except Exception as e:
+            yield filename, e, None, None
+
+
+def parseFilings(filenames, workers=None, engine=None, cacheDir=None, cacheSize=None, metricsSink=None,
+                 concepts=statementConcepts, earlyExit=False):
+    """Parse many filings across a pool of worker processes.
+
+    filenames may name instance documents or filing archives. Yields (filename, result,
+    error) tuples in completion order, where result is the (CIK, InstantContextData,
+    DateRangeContextData) tuple from parseFilingFile() followed by the statementPeriods()
+    of every period in the filing, and filename is an archive member's
+    name for filings read from archives. A filing that fails to parse yields a result of
+    None and the exception, and the run carries on. If metricsSink is given it is called
+    with each filing's ParseMetrics."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    def finished(filename, result, metrics, error):
+        if error is not None:
+            print("Failed to parse " + filename + ": " + repr(error), file=sys.stderr)
+        if metricsSink is not None:
+            metricsSink(metrics)
+        return filename, result, error
+
+    def failed(filename, error):
+        metrics = ParseMetrics(filename)
+        metrics.error = repr(error)
+        return finished(filename, None, metrics, error)
+
+    if workers <= 1:
+        # Parse in-process. Handy for debugging since tracebacks stay put, and archive
+        # members are parsed straight from the archive stream.
+        for name, source, size, digest in iterFilingSources(filenames):
+            if isinstance(source, Exception):
+                yield failed(name, source)
+            else:
+                yield finished(name, *parseFilingTask(name, source, engine, cacheDir, cacheSize, size, digest,
+                                                      concepts, earlyExit))
+        return
+
+    def completed(future, name):
+        error = future.exception()
+        if error is not None:
+            # The worker itself died, so there are no metrics from it
+            return failed(name, error)
+        return finished(name, *future.result())
+
+    # Only a few filings per worker are in flight at once, so archive members read into
+    # memory for the workers do not pile up
+    maxPending = workers * 2
+    pending = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=setVerbose,
+                                                initargs=(gVerbose,)) as executor:
+        for name, source, size, digest in iterFilingSources(filenames):
+            if isinstance(source, Exception):
+                yield failed(name, source)
+                continue
+            if not isinstance(source, str):
+                # An archive member: read it here, once, and hand the bytes to a worker
+                source = source.read()
+            future = executor.submit(parseFilingTask, name, source, engine, cacheDir, cacheSize, size, digest,
+                                     concepts, earlyExit)
+            pending[future] = name
+
+            while len(pending) >= maxPending:
+                done, notDone = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield completed(future, pending.pop(future))
+
+        for future in concurrent.futures.as_completed(pending):
+            yield completed(future, pending[future])
+
+
+def main(argv=None):
+    from vidb.cli import addLoadArguments, addParseArguments
+
+    argParser = argparse.ArgumentParser(description="Parse XBRL filings into dictionaries.")
+    addParseArguments(argParser)
+    argParser.add_argument("--load", action="store_true",
+                           help="upsert the parsed filings into the cik_financials and cik_facts tables")
+    addLoadArguments(argParser)
+    args = argParser.parse_args(argv)
+
+    if not args.paths and not args.manifest:
+        argParser.print_usage()
+        sys.exit(-1)
+
+    runFilings(args)
+
+
+def runFilings(args):
+    """Parse, and with args.load load, the filings named by parsed command line arguments."""
+    setVerbose(args.verbose)
+
+    filenames = expandFilingPaths(args.paths, args.manifest)
+
+    concepts = statementConcepts
+    if args.all_concepts:
+        concepts = None
+    elif args.concepts:
+        with open(args.concepts) as f:
+            concepts = frozenset(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+    ingestManifest = None
+    filingStates = {}
+    if args.incremental:
+        from vidb.IngestManifest import IngestManifest
+        ingestManifest = IngestManifest(args.ingest_manifest)
+        for filename in filenames:
+            state = ingestManifest.checkFiling(filename)
+            if state is not None:
+                filingStates[filename] = state
+        print("Skipping " + str(len(filenames) - len(filingStates)) + " unchanged filings")
+        filenames = [filename for filename in filenames if filename in filingStates]
+
+    metricsWriter = openMetricsWriter(args.metrics) if args.metrics else None
+
+    exporter = None
+    if args.export:
+        from vidb.FinancialsExport import FinancialsExporter
+        try:
+            exporter = FinancialsExporter(args.export, args.export_format)
+        except ImportError as e:
+            print(e, file=sys.stderr)
+            sys.exit(-1)
+    failed = []
+    parsed = []
+
+    def parsedFilings():
+        for filename, result, error in parseFilings(filenames, args.workers, args.engine,
+                                                    args.cache_dir, args.cache_size_mb * 1024 * 1024,
+                                                    metricsWriter.write if metricsWriter else None,
+                                                    concepts, args.early_exit):
+            if error is not None:
+                failed.append(filename)
+            else:
+                parsed.append((filename, result[0]))
+                if exporter is not None:
+                    exporter.add(result)
+                yield result
+
+    if args.load:
+        # Parsing and database writes overlap: results go through a bounded queue to a pool
+        # of writer threads while the parser workers carry on
+        from vidb.IngestPipeline import IngestPipeline
+        pipeline = IngestPipeline(args.dsn, args.writers, args.batch_size)
+        try:
+            for result in parsedFilings():
+                pipeline.put(result)
+        finally:
+            loaded = pipeline.close()
+        print("Loaded " + str(loaded) + " filings into cik_financials and cik_facts")
+    else:
+        for result in parsedFilings():
+            pass
+
+    if ingestManifest is not None:
+        # Only filings that made it into the database count as ingested; a parse-only run
+        # leaves the manifest alone.
+        # An archive is recorded as a whole, and only if every filing in it went in.
+        if args.load:
+            failedPaths = {archivePath(filename) for filename in failed}
+            records = {}
+            for filename, CIK in parsed:
+                path = archivePath(filename)
+                if path not in failedPaths:
+                    records[path] = (path, filingStates[path], CIK)
+            ingestManifest.recordFilings(records.values())
+        ingestManifest.close()
+
+    if metricsWriter is not None:
+        metricsWriter.close()
+
+    if exporter is not None:
+        print("Exported " + str(exporter.close()) + " statement periods to " + args.export)
+
+    print("Parsed " + str(len(parsed)) + " of " + str(len(parsed) + len(failed)) + " filings")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+#
+# Parse EDGAR XBRL filings and maintain the VI database built from them.
+#
+# Nothing is imported here, so that importing one module of the package, or starting the
+# command line, does not drag in the rest.
+#
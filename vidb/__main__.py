@@ -0,0 +1,6 @@
+#
+# Run the vidb command line: python -m vidb --help
+#
+from vidb.cli import main
+
+main()
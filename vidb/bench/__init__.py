@@ -0,0 +1,3 @@
+#
+# Benchmarks, run as python -m vidb bench suite|engines|memory|synth.
+#
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+# Compare the parser engines on the same set of filings.
+#
+# Every filing is parsed by each available engine in turn, each in a fresh run of
+# XBRLParser.parseFiling(), and the best of --repeat runs is reported per engine along
+# with a check that the engines extracted the same data. With --early-exit each engine is
+# timed again stopping early, with how much of the current period that still finds.
+#
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+from vidb import XBRLToDicts
+
+
+def timeEngine(engine, filenames, repeat, earlyExit=False):
+    best = None
+    results = None
+    for i in range(repeat):
+        runResults = []
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for filename in filenames:
+                runResults.append(XBRLToDicts.parseFilingFile(filename, engine, earlyExit=earlyExit))
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+        results = runResults
+    return best, results
+
+
+def countFacts(results):
+    return sum(len(balanceDict or {}) + len(incomeDict or {}) for CIK, balanceDict, incomeDict in results)
+
+
+def main(argv=None):
+    argParser = argparse.ArgumentParser(description="Compare XBRL parser engines on a corpus of filings.")
+    argParser.add_argument("paths", nargs="+", metavar="path", help="filing, directory of filings or glob pattern")
+    argParser.add_argument("--repeat", type=int, default=3, help="runs per engine; the best is reported (default: 3)")
+    argParser.add_argument("--early-exit", action="store_true", help="also time each engine with the early exit")
+    args = argParser.parse_args(argv)
+
+    filenames = XBRLToDicts.expandFilingPaths(args.paths)
+    totalBytes = sum(os.path.getsize(filename) for filename in filenames)
+    print("%d filings, %.1f MB" % (len(filenames), totalBytes / 1048576.0))
+
+    if "lxml" not in XBRLToDicts.parserEngines:
+        print("lxml is not installed; only the etree engine can be measured")
+
+    timings = {}
+    results = {}
+    for engine in sorted(XBRLToDicts.parserEngines):
+        timings[engine], results[engine] = timeEngine(engine, filenames, args.repeat)
+        print("%-6s %8.3f s  %8.1f MB/s" % (engine, timings[engine], totalBytes / 1048576.0 / timings[engine]))
+        if args.early_exit:
+            earlyTime, earlyResults = timeEngine(engine, filenames, args.repeat, earlyExit=True)
+            print("%-6s %8.3f s  %8.1f MB/s  early exit, %.2fx faster, %d of %d current period facts" % (
+                engine, earlyTime, totalBytes / 1048576.0 / earlyTime, timings[engine] / earlyTime,
+                countFacts(earlyResults), countFacts(results[engine])))
+
+    if len(results) > 1:
+        engines = sorted(results)
+        for engine in engines[1:]:
+            if results[engine] != results[engines[0]]:
+                print("MISMATCH: " + engine + " and " + engines[0] + " extracted different data")
+                sys.exit(1)
+        print("etree / lxml time ratio: %.2f" % (timings["etree"] / timings["lxml"]))
+
+
+if __name__ == "__main__":
+    main()
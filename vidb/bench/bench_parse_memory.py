@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+# Regression benchmark for the memory use of XBRLParser.parseFiling().
+#
+# Generates a synthetic instance document of the requested size, parses it in a child
+# process and fails if the child's peak resident set size exceeds the ceiling.
+#
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from vidb import XBRLToDicts
+from vidb.bench.synthxbrl import writeSyntheticFiling
+
+
+def peakRSS():
+    """This process's peak resident set size in bytes. On Linux ru_maxrss carries over
+    the parent's peak across the fork and exec that start a spawned child, so the
+    high-water mark of the process's own memory is read from /proc instead."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def parseAndMeasure(path, engine, queue):
+    sys.stdout = open(os.devnull, "w")
+    baseline = peakRSS()
+    start = time.perf_counter()
+    XBRLToDicts.XBRLParser(path, engine).parseFiling()
+    elapsed = time.perf_counter() - start
+    queue.put((baseline, peakRSS(), elapsed))
+
+
+def main(argv=None):
+    argParser = argparse.ArgumentParser(description="Check the peak memory of parseFiling() on a large synthetic filing.")
+    argParser.add_argument("--size-mb", type=int, default=200, help="size of the synthetic filing (default: 200)")
+    argParser.add_argument("--ceiling-mb", type=int, default=100, help="maximum allowed peak RSS (default: 100)")
+    argParser.add_argument("--engine", default="auto", help="parser engine to measure (default: auto)")
+    argParser.add_argument("--keep", metavar="PATH", help="write the filing here and keep it")
+    args = argParser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        path = args.keep or os.path.join(tmpDir, "synthetic-200.xml")
+        # Large real filings are mostly text blocks, so that is where the bulk goes
+        writeSyntheticFiling(path, facts=2000, targetBytes=args.size_mb * 1024 * 1024)
+
+        # Measure in a fresh process so the generator and earlier runs do not count
+        queue = multiprocessing.get_context("spawn").Queue()
+        child = multiprocessing.get_context("spawn").Process(target=parseAndMeasure, args=(path, args.engine, queue))
+        child.start()
+        baseline, peak, elapsed = queue.get()
+        child.join()
+
+    print("Parsed %d MB in %.1f s, peak RSS %.1f MB (%.1f MB before parsing)"
+          % (args.size_mb, elapsed, peak / 1048576.0, baseline / 1048576.0))
+
+    if peak > args.ceiling_mb * 1024 * 1024:
+        print("FAIL: peak RSS exceeds the %d MB ceiling" % args.ceiling_mb)
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
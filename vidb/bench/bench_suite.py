@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+#
+# Benchmark the parser and loader over synthetic filings of increasing size.
+#
+# For each size a synthetic filing is generated, then parsed in a fresh child process to
+# measure throughput (facts/s and MB/s) and peak memory. The parsed result is then loaded
+# as --load-rows filings with distinct CIKs the way --load does it: batch by batch through
+# the ingest pipeline's writer, into cik_financials, cik_facts and cik_ratios, and then
+# cik_statements is refreshed. That is either into a real database (--dsn; use a scratch
+# database, the rows are real) or into a stub connection that only consumes what would be
+# sent, which measures the client side of the load.
+#
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from vidb import XBRLToDicts
+from vidb.bench.bench_parse_memory import peakRSS
+from vidb.bench.synthxbrl import deiPositions, parseSize, writeSyntheticFiling
+
+from vidb import LoadVIdbTable_CIKFacts as factLoader
+from vidb import LoadVIdbTable_CIKFinancials as loader
+from vidb.IngestPipeline import writeBatch
+
+DEFAULT_SIZES = "100K,1M,10M,100M"
+
+
+class StubCursor:
+    """Just enough of a psycopg2 cursor for the loaders. COPY data is read and discarded."""
+
+    def __init__(self, stub):
+        self.stub = stub
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        pass
+
+    def execute(self, sql, args=None):
+        self.stub.statements += 1
+
+    def copy_expert(self, sql, f):
+        self.stub.statements += 1
+        self.stub.bytesCopied += len(f.read())
+
+
+class StubConnection:
+    """Stands in for a database connection when benchmarking offline."""
+
+    def __init__(self):
+        self.statements = 0
+        self.bytesCopied = 0
+        self.transactions = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        self.transactions += 1
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def close(self):
+        pass
+
+
+def parseAndMeasure(path, engine, queue):
+    sys.stdout = open(os.devnull, "w")
+    xbrlParser = XBRLToDicts.XBRLParser(path, engine)
+    start = time.perf_counter()
+    balanceDict, incomeDict = xbrlParser.parseFiling()
+    elapsed = time.perf_counter() - start
+    peak = peakRSS()
+    statements = XBRLToDicts.statementPeriods(xbrlParser.periods, xbrlParser.DEIDict.get('DocumentType'))
+    queue.put((elapsed, peak, xbrlParser.metrics.asDict(), (xbrlParser.CIK, balanceDict, incomeDict, statements)))
+
+
+def measureParse(path, engine):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    child = context.Process(target=parseAndMeasure, args=(path, engine, queue))
+    child.start()
+    result = queue.get()
+    child.join()
+    return result
+
+
+def measureLoad(parsed, rows, batchSize, dsn):
+    CIK, balanceDict, incomeDict, statements = parsed
+    filings = [(CIK + i, balanceDict, incomeDict, statements) for i in range(rows)]
+
+    conn = loader.connect(dsn) if dsn else StubConnection()
+    try:
+        start = time.perf_counter()
+        for i in range(0, len(filings), batchSize):
+            writeBatch(conn, filings[i:i + batchSize])
+        factLoader.refreshStatements(conn)
+        return time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    argParser = argparse.ArgumentParser(description="Benchmark parsing and loading of synthetic XBRL filings.")
+    argParser.add_argument("--sizes", default=DEFAULT_SIZES,
+                           help="comma separated filing sizes (default: " + DEFAULT_SIZES + ")")
+    argParser.add_argument("--text-fraction", type=float, default=0.3,
+                           help="share of each filing that is text blocks (default: 0.3)")
+    argParser.add_argument("--contexts", type=int, default=24, help="consolidated contexts (default: 24)")
+    argParser.add_argument("--dimensional-contexts", type=int, default=16, help="segment contexts (default: 16)")
+    argParser.add_argument("--dei-position", choices=deiPositions, default="first",
+                           help="where the DEI header goes in the filings (default: first)")
+    argParser.add_argument("--engine", default="auto", help="parser engine (default: auto)")
+    argParser.add_argument("--load-rows", type=int, default=1000, help="rows to load per size (default: 1000)")
+    argParser.add_argument("--batch-size", type=int, default=1000, help="rows per load transaction (default: 1000)")
+    argParser.add_argument("--dsn", default=None,
+                           help="load into this database instead of a stub (use a scratch database)")
+    argParser.add_argument("--json", metavar="FILE", help="also write the results as JSON lines here")
+    argParser.add_argument("--dir", help="keep the generated filings in this directory")
+    args = argParser.parse_args(argv)
+
+    results = []
+    print("%8s %9s %8s %10s %8s %9s %10s" % ("size", "facts", "parse s", "facts/s", "MB/s", "peak MB", "load rows/s"))
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        directory = args.dir or tmpDir
+        os.makedirs(directory, exist_ok=True)
+
+        for sizeText in args.sizes.split(","):
+            sizeBytes = parseSize(sizeText)
+            path = os.path.join(directory, "synthetic-" + sizeText.strip() + ".xml")
+            writeSyntheticFiling(path, targetBytes=sizeBytes, contexts=args.contexts,
+                                 dimensionalContexts=args.dimensional_contexts, textFraction=args.text_fraction,
+                                 deiPosition=args.dei_position)
+            fileBytes = os.path.getsize(path)
+
+            elapsed, peak, metrics, parsed = measureParse(path, args.engine)
+            loadSeconds = measureLoad(parsed, args.load_rows, args.batch_size, args.dsn)
+
+            result = {
+                "size": sizeText.strip(),
+                "bytes": fileBytes,
+                "facts": metrics["facts"],
+                "parseSeconds": elapsed,
+                "factsPerSecond": metrics["facts"] / elapsed,
+                "megabytesPerSecond": fileBytes / 1048576.0 / elapsed,
+                "peakRSS": peak,
+                "loadRows": args.load_rows,
+                "loadSeconds": loadSeconds,
+                "metrics": metrics,
+            }
+            results.append(result)
+            print("%8s %9d %8.2f %10.0f %8.1f %9.1f %10.0f" % (
+                result["size"], result["facts"], elapsed, result["factsPerSecond"],
+                result["megabytesPerSecond"], peak / 1048576.0, args.load_rows / loadSeconds))
+
+    if args.json:
+        with open(args.json, "a") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
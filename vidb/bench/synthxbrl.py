@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+#
+# Generate synthetic us-gaap/dei XBRL instance documents for the benchmarks.
+#
+# The documents have the shape of an EDGAR filing: the DEI header, a set of consolidated
+# contexts (fiscal year durations and instants, current and prior), a set of dimensional
+# contexts with segment members, numeric facts spread across them, per share amounts
+# among them, and text block facts for bulk. As in the taxonomy, balance sheet concepts
+# only have instant facts and the others only date range facts. The DEI header can also be
+# put after the contexts or at the very end, and the concepts written in alphabetical
+# rather than statement order, as some filing agents do. Everything is driven by a seeded
+# random generator, so the same arguments always produce the same bytes.
+#
+import argparse
+import random
+from datetime import date, timedelta
+
+from vidb.LoadVIdbTable_CIKFinancials import CIKFinancialsColumns
+
+# The concepts of the cik_financials table first, so that the statement selection finds
+# what it looks for, then as many made-up ones as the fact count calls for. The money
+# columns are per share amounts, and are written as such.
+tableConcepts = [name for name, sqlType in CIKFinancialsColumns[1:]]
+perShareConcepts = frozenset(name for name, sqlType in CIKFinancialsColumns[1:] if sqlType == "money")
+
+# The balance sheet columns, from cash down to total liabilities and equity, are instants
+balanceSheetConcepts = frozenset(tableConcepts[tableConcepts.index("CashAndCashEquivalentsAtCarryingValue"):
+                                               tableConcepts.index("LiabilitiesAndStockholdersEquity") + 1])
+
+# The order the cik_financials concepts are written in: the table's, or alphabetical
+conceptOrders = ("columns", "alphabetical")
+
+# Where the DEI header goes: before everything, between the contexts and the facts, or last
+deiPositions = ("first", "after-contexts", "last")
+
+HEADER = """<?xml version="1.0" encoding="utf-8"?>
+<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:us-gaap="http://fasb.org/us-gaap/2015-01-31" xmlns:dei="http://xbrl.sec.gov/dei/2014-01-31" xmlns:iso4217="http://www.xbrl.org/2003/iso4217" xmlns:xbrldi="http://xbrl.org/2006/xbrldi" xmlns:synth="http://example.com/synth/2015">
+<xbrli:unit id="usd"><xbrli:measure>iso4217:USD</xbrli:measure></xbrli:unit>
+<xbrli:unit id="usdPerShare"><xbrli:divide><xbrli:unitNumerator><xbrli:measure>iso4217:USD</xbrli:measure></xbrli:unitNumerator><xbrli:unitDenominator><xbrli:measure>xbrli:shares</xbrli:measure></xbrli:unitDenominator></xbrli:divide></xbrli:unit>
+"""
+
+DEI = """<dei:DocumentType contextRef="D0">%(docType)s</dei:DocumentType>
+<dei:DocumentPeriodEndDate contextRef="D0">%(periodEnd)s</dei:DocumentPeriodEndDate>
+<dei:EntityCentralIndexKey contextRef="D0">%(cik)010d</dei:EntityCentralIndexKey>
+<dei:EntityRegistrantName contextRef="D0">Synthetic Filer %(cik)d</dei:EntityRegistrantName>
+"""
+
+ENTITY = '<xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">%010d</xbrli:identifier>%s</xbrli:entity>'
+SEGMENT = '<xbrli:segment><xbrldi:explicitMember dimension="us-gaap:StatementBusinessSegmentsAxis">synth:Segment%dMember</xbrldi:explicitMember></xbrli:segment>'
+DURATION = '<xbrli:context id="%s">%s<xbrli:period><xbrli:startDate>%s</xbrli:startDate><xbrli:endDate>%s</xbrli:endDate></xbrli:period></xbrli:context>\n'
+INSTANT = '<xbrli:context id="%s">%s<xbrli:period><xbrli:instant>%s</xbrli:instant></xbrli:period></xbrli:context>\n'
+FACT = '<us-gaap:%s contextRef="%s" unitRef="usd" decimals="-6">%d</us-gaap:%s>\n'
+PER_SHARE_FACT = '<us-gaap:%s contextRef="%s" unitRef="usdPerShare" decimals="2">%d.%02d</us-gaap:%s>\n'
+TEXT_BLOCK = '<us-gaap:Note%dTextBlock contextRef="D0">%s</us-gaap:Note%dTextBlock>\n'
+PARAGRAPH = "&lt;p&gt;Synthetic footnote text for the benchmarks.&lt;/p&gt;\n" * 200
+
+# Rough size of one numeric fact, used to split a byte budget between facts and text
+FACT_BYTES = 120
+
+
+def conceptName(index, conceptOrder="columns"):
+    if index < len(tableConcepts):
+        if conceptOrder == "alphabetical":
+            return sortedTableConcepts[index]
+        return tableConcepts[index]
+    return "SyntheticConcept%d" % index
+
+
+sortedTableConcepts = sorted(tableConcepts)
+
+
+def periodLength(docType):
+    return 364 if docType == "10-K" else 91
+
+
+def writeSyntheticFiling(path, facts=None, targetBytes=None, contexts=24, dimensionalContexts=16,
+                         textFraction=0.3, cik=320193, docType="10-K", periodEnd=date(2015, 9, 26), seed=0,
+                         deiPosition="first", conceptOrder="columns"):
+    """Write a synthetic instance document and return the number of numeric facts in it.
+
+    contexts consolidated contexts are written, alternating duration and instant and
+    stepping back one period at a time, plus dimensionalContexts segment contexts for the
+    current period. The size comes from facts, targetBytes or both: numeric facts are
+    written one concept at a time over its contexts (the instants for balance sheet
+    concepts, the date ranges for the others), and text blocks are added until the file
+    reaches targetBytes. Given only targetBytes, textFraction of it goes to text blocks.
+    deiPosition is one of deiPositions and conceptOrder one of conceptOrders."""
+    if facts is None:
+        facts = int((targetBytes or 0) * (1.0 - textFraction) / FACT_BYTES)
+    rng = random.Random(seed)
+    days = periodLength(docType)
+
+    dei = DEI % {"docType": docType, "periodEnd": periodEnd.isoformat(), "cik": cik}
+    instantIDs = []
+    rangeIDs = []
+    with open(path, "w") as f:
+        f.write(HEADER)
+        if deiPosition == "first":
+            f.write(dei)
+
+        entity = ENTITY % (cik, "")
+        for i in range(contexts):
+            end = periodEnd - timedelta(days=(days + 1) * (i // 2))
+            if i % 2 == 0:
+                contextID = "D%d" % (i // 2)
+                f.write(DURATION % (contextID, entity, (end - timedelta(days=days)).isoformat(), end.isoformat()))
+                rangeIDs.append(contextID)
+            else:
+                contextID = "I%d" % (i // 2)
+                f.write(INSTANT % (contextID, entity, end.isoformat()))
+                instantIDs.append(contextID)
+
+        start = (periodEnd - timedelta(days=days)).isoformat()
+        for i in range(dimensionalContexts):
+            contextID = "D0_Segment%d" % i
+            f.write(DURATION % (contextID, ENTITY % (cik, SEGMENT % i), start, periodEnd.isoformat()))
+            rangeIDs.append(contextID)
+
+        if deiPosition == "after-contexts":
+            f.write(dei)
+
+        textBlocks = 0
+        for i, (concept, contextID) in enumerate(factContexts(facts, instantIDs, rangeIDs, conceptOrder)):
+            if concept in perShareConcepts:
+                f.write(PER_SHARE_FACT % (concept, contextID, rng.randrange(-5, 20), rng.randrange(100), concept))
+            else:
+                f.write(FACT % (concept, contextID, rng.randrange(-10**9, 10**12) * 1000, concept))
+            # Interleave the text blocks with the facts, the way a real filing does
+            if targetBytes and i % 1000 == 999 and f.tell() < targetBytes * (i + 1) / facts:
+                f.write(TEXT_BLOCK % (textBlocks, PARAGRAPH, textBlocks))
+                textBlocks += 1
+
+        while targetBytes and f.tell() < targetBytes:
+            f.write(TEXT_BLOCK % (textBlocks, PARAGRAPH, textBlocks))
+            textBlocks += 1
+
+        if deiPosition == "last":
+            f.write(dei)
+        f.write("</xbrli:xbrl>\n")
+
+    return facts
+
+
+def factContexts(facts, instantIDs, rangeIDs, conceptOrder):
+    """Yield (concept, context ID) for the first facts numeric facts."""
+    if not instantIDs and not rangeIDs:
+        return
+    conceptIndex = 0
+    while facts > 0:
+        concept = conceptName(conceptIndex, conceptOrder)
+        conceptIndex += 1
+        contextIDs = instantIDs if concept in balanceSheetConcepts else rangeIDs
+        for contextID in contextIDs[:facts]:
+            yield concept, contextID
+        facts -= len(contextIDs)
+
+
+def parseSize(text):
+    """Parse a size such as 100K, 10M or 1G into bytes."""
+    multipliers = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text and text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+
+def main(argv=None):
+    argParser = argparse.ArgumentParser(description="Write a synthetic XBRL instance document.")
+    argParser.add_argument("path", help="file to write")
+    argParser.add_argument("--size", type=parseSize, default=None, help="target file size, e.g. 100K, 10M, 500M")
+    argParser.add_argument("--facts", type=int, default=None, help="number of numeric facts")
+    argParser.add_argument("--contexts", type=int, default=24, help="consolidated contexts (default: 24)")
+    argParser.add_argument("--dimensional-contexts", type=int, default=16, help="segment contexts (default: 16)")
+    argParser.add_argument("--text-fraction", type=float, default=0.3,
+                           help="share of --size given to text blocks when --facts is not set (default: 0.3)")
+    argParser.add_argument("--cik", type=int, default=320193)
+    argParser.add_argument("--doc-type", choices=["10-K", "10-Q"], default="10-K")
+    argParser.add_argument("--dei-position", choices=deiPositions, default="first",
+                           help="where the DEI header goes (default: first)")
+    argParser.add_argument("--concept-order", choices=conceptOrders, default="columns",
+                           help="order the cik_financials concepts are written in (default: columns)")
+    argParser.add_argument("--seed", type=int, default=0)
+    args = argParser.parse_args(argv)
+
+    if args.size is None and args.facts is None:
+        argParser.error("give --size, --facts or both")
+
+    facts = writeSyntheticFiling(args.path, args.facts, args.size, args.contexts, args.dimensional_contexts,
+                                 args.text_fraction, args.cik, args.doc_type, seed=args.seed,
+                                 deiPosition=args.dei_position, conceptOrder=args.concept_order)
+    print("Wrote %d facts to %s" % (facts, args.path))
+
+
+if __name__ == "__main__":
+    main()
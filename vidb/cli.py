@@ -0,0 +1,125 @@
+#
+# The vidb command line:
+#
+#     python -m vidb schema init|migrate    create or migrate the database schema
+#     python -m vidb parse PATH...          parse filings
+#     python -m vidb load PATH...           parse filings and load them into the database
+#     python -m vidb bench suite|engines|memory|synth ...
+#
+# Each command imports what it needs only when it runs, so short cron-driven runs do not
+# pay for what they do not use, and only the database commands import psycopg2.
+#
+import argparse
+import importlib
+import sys
+
+benchModules = {
+    "suite": "vidb.bench.bench_suite",
+    "engines": "vidb.bench.bench_engines",
+    "memory": "vidb.bench.bench_parse_memory",
+    "synth": "vidb.bench.synthxbrl",
+}
+
+
+def addParseArguments(argParser):
+    """Add the options for finding and parsing filings to an argument parser."""
+    argParser.add_argument("paths", nargs="*", metavar="path",
+                           help="XML instance document, directory of filings or glob pattern")
+    argParser.add_argument("-m", "--manifest", action="append", default=[],
+                           help="file listing one filing per line (may be repeated)")
+    argParser.add_argument("-j", "--workers", type=int, default=None,
+                           help="number of worker processes (default: one per CPU)")
+    argParser.add_argument("--engine", choices=["auto", "etree", "lxml"], default="auto",
+                           help="XML parser engine (default: lxml if installed, else etree)")
+    argParser.add_argument("--cache-dir", default=None,
+                           help="cache extracted facts here, keyed by file contents")
+    argParser.add_argument("--cache-size-mb", type=int, default=1024,
+                           help="evict least recently used cache entries beyond this size (default: 1024)")
+    argParser.add_argument("--metrics", default=None, metavar="FILE",
+                           help="write per-filing metrics as JSON lines, or Prometheus text if FILE ends in .prom")
+    argParser.add_argument("--concepts", default=None, metavar="FILE",
+                           help="keep only the US GAAP concepts listed in FILE, one per line " +
+                                "(default: the cik_financials columns)")
+    argParser.add_argument("--all-concepts", action="store_true",
+                           help="keep every numeric US GAAP fact, not just the cik_financials columns")
+    argParser.add_argument("--early-exit", action="store_true",
+                           help="stop reading a filing once every concept kept has a current period fact; " +
+                                "comparative periods may then be incomplete. Mostly useful with --concepts")
+    argParser.add_argument("--export", default=None, metavar="DIR",
+                           help="also write each statement period to partitioned files in DIR (needs pyarrow)")
+    argParser.add_argument("--export-format", choices=["parquet", "arrow"], default="parquet",
+                           help="file format for --export (default: parquet)")
+    argParser.add_argument("-v", "--verbose", action="store_true",
+                           help="log every fact and context as it is parsed")
+
+
+def addLoadArguments(argParser):
+    """Add the options for loading parsed filings into the database."""
+    argParser.add_argument("--dsn", default=None,
+                           help="PostgreSQL connection string (default: $VIDB_DSN)")
+    argParser.add_argument("--batch-size", type=int, default=1000,
+                           help="filings per load transaction (default: 1000)")
+    argParser.add_argument("--writers", type=int, default=2,
+                           help="database writer threads and connections when loading (default: 2)")
+    argParser.add_argument("--incremental", action="store_true",
+                           help="skip filings already loaded and unchanged since, per the ingest manifest")
+    argParser.add_argument("--ingest-manifest", default="vidb-ingest.sqlite3",
+                           help="SQLite file recording loaded filings (default: vidb-ingest.sqlite3)")
+
+
+def schemaCommand(args):
+    from vidb import LoadVIdbTable_CIKFinancials as loader
+    from vidb import Schema
+
+    conn = loader.connect(args.dsn)
+    try:
+        Schema.createSchema(conn, args.table or Schema.schemaTables, migrate=args.action == "migrate")
+    finally:
+        conn.close()
+    print("Schema " + ("migrated" if args.action == "migrate" else "created"))
+
+
+def parseCommand(args):
+    if not args.paths and not args.manifest:
+        args.printUsage()
+        sys.exit(-1)
+
+    from vidb import XBRLToDicts
+    XBRLToDicts.runFilings(args)
+
+
+def benchCommand(args):
+    sys.argv[0] = "vidb bench " + args.benchmark  # for the benchmark's usage messages
+    importlib.import_module(benchModules[args.benchmark]).main(args.benchArgs)
+
+
+def main(argv=None):
+    argParser = argparse.ArgumentParser(prog="vidb", description="Build and maintain the VI database from XBRL filings.")
+    commands = argParser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    schemaParser = commands.add_parser("schema", help="create or migrate the database schema")
+    schemaParser.add_argument("action", choices=["init", "migrate"],
+                              help="init creates what is missing; migrate also updates cik_financials' columns")
+    schemaParser.add_argument("--table", action="append", choices=["cik_financials", "cik_facts", "cik_ratios"],
+                              help="only this table and what goes with it (may be repeated; default: all)")
+    schemaParser.add_argument("--dsn", default=None,
+                              help="PostgreSQL connection string (default: $VIDB_DSN)")
+    schemaParser.set_defaults(run=schemaCommand)
+
+    parseParser = commands.add_parser("parse", help="parse filings")
+    addParseArguments(parseParser)
+    parseParser.set_defaults(run=parseCommand, printUsage=parseParser.print_usage, load=False, incremental=False)
+
+    loadParser = commands.add_parser("load", help="parse filings and load them into the database")
+    addParseArguments(loadParser)
+    addLoadArguments(loadParser)
+    loadParser.set_defaults(run=parseCommand, printUsage=loadParser.print_usage, load=True)
+
+    benchParser = commands.add_parser("bench", help="run a benchmark; pass -h after its name for its options")
+    benchParser.add_argument("benchmark", choices=sorted(benchModules))
+    benchParser.add_argument("benchArgs", nargs=argparse.REMAINDER, metavar="...")
+    benchParser.set_defaults(run=benchCommand)
+
+    args = argParser.parse_args(argv)
+    args.run(args)